@@ -15,12 +15,11 @@ __version__ = "0.1.0"
 __author__ = "Your Name"
 __license__ = "MIT"
 
+from typing import Any, List
+
 # Core compression
 from .compressor import VideoCompressor, CompressionResult
 
-# Batch processing
-from .batch import BatchCompressor, BatchProgress
-
 # Presets
 from .presets import CompressionPreset, PRESETS, get_preset, list_presets
 
@@ -29,6 +28,7 @@ from .progress import (
     ProgressCallback,
     ProgressTracker,
     FFmpegProgressParser,
+    parse_progress_report,
     create_tqdm_callback,
     create_simple_callback
 )
@@ -67,6 +67,7 @@ __all__ = [
     'ProgressCallback',
     'ProgressTracker',
     'FFmpegProgressParser',
+    'parse_progress_report',
     'create_tqdm_callback',
     'create_simple_callback',
 
@@ -85,3 +86,25 @@ __all__ = [
     'AlphaChannelNotSupportedError',
     'InvalidOutputPathError',
 ]
+
+# Names imported from their submodule on first access (PEP 562), so a
+# single compress() call doesn't pay for the batch machinery.
+_LAZY_ATTRS = {
+    'BatchCompressor': 'batch',
+    'BatchProgress': 'batch',
+}
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value  # Cache so __getattr__ isn't hit again
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
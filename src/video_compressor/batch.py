@@ -3,26 +3,74 @@ Batch video compression with concurrent processing.
 """
 
 import os
-import asyncio
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Union, Tuple, Optional, Dict
+import sys
+import functools
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import List, Union, Tuple, Optional, Dict, FrozenSet, Set
 from pathlib import Path
-from .compressor import VideoCompressor, CompressionResult
+from .compressor import (
+    VideoCompressor,
+    CompressionResult,
+    vp9_threading,
+    VP9_MAX_THREADS,
+    _EncodeJob
+)
 from .progress import ProgressCallback
+from .utils import VideoInfo
+from .exceptions import VideoCompressorError
+
+# Maximum number of FFprobe processes started at once by preflight()
+PREFLIGHT_CONCURRENCY = 16
+
+# Minimum seconds between BatchProgress console writes
+PROGRESS_LOG_INTERVAL = 0.2
+
+# Concurrent encodes for hardware encoders: the GPU has one fixed-function
+# encode engine, so extra sessions only queue on it (or fail to open)
+HW_ENCODE_WORKERS = 2
+
+# Frame width assumed when sizing the worker pool automatically (1080p)
+DEFAULT_ENCODE_WIDTH = 1920
+
+
+def default_max_workers() -> int:
+    """Number of concurrent encodes that fits the CPU without oversubscribing it.
+
+    Each libvpx-vp9 encode already runs several threads, so the pool is sized
+    to ``cpu_count // threads_per_encode`` rather than one job per core.
+
+    Returns:
+        Worker count (at least 1)
+    """
+    _, threads_per_encode = vp9_threading(DEFAULT_ENCODE_WIDTH)
+    return max(1, (os.cpu_count() or 1) // threads_per_encode)
 
 
 class BatchCompressor:
     """Handle batch video compression with parallel processing."""
 
-    def __init__(self, compressor: VideoCompressor, max_workers: int = 4):
+    def __init__(
+        self,
+        compressor: VideoCompressor,
+        max_workers: Optional[int] = None,
+        pin_cpus: bool = False
+    ):
         """Initialize batch compressor.
 
         Args:
             compressor: VideoCompressor instance to use
-            max_workers: Maximum number of concurrent compression jobs
+            max_workers: Maximum number of concurrent compression jobs. If None,
+                derived from the CPU count and FFmpeg's threads per encode.
+            pin_cpus: Pin each concurrent final encode to its own slice of the
+                CPUs (Linux only), so an encoder's threads stay on cores that
+                share caches instead of migrating across the machine.
         """
         self.compressor = compressor
-        self.max_workers = max_workers
+        self.max_workers = max_workers or default_max_workers()
+        self.pin_cpus = pin_cpus
 
     def compress_batch(
         self,
@@ -32,6 +80,7 @@ class BatchCompressor:
         codec: Optional[str] = None,
         preserve_alpha: bool = False,
         progress_callback: Optional[ProgressCallback] = None,
+        sort_by_cost: bool = True,
         **kwargs
     ) -> List[CompressionResult]:
         """Compress multiple video files in parallel.
@@ -43,6 +92,8 @@ class BatchCompressor:
             codec: Optional codec override
             preserve_alpha: Preserve alpha channel
             progress_callback: Optional progress callback
+            sort_by_cost: Start the most expensive encodes (duration x pixels)
+                first. Disable to keep the given order.
             **kwargs: Additional options passed to compress()
 
         Returns:
@@ -66,38 +117,90 @@ class BatchCompressor:
         # Build file pairs (input, output)
         file_pairs = self._build_file_pairs(files, output_dir)
 
+        # Share the CPU between the encodes that actually run at once
+        kwargs.setdefault('threads', self._threads_per_job(len(file_pairs)))
+
+        # Probe all files up front; otherwise the single first-stage worker
+        # would run FFprobe for them one by one
+        if len(file_pairs) > 1:
+            infos = self._preflight_sync([input_path for input_path, _ in file_pairs])
+
+            # Start the longest encodes first so one doesn't run alone at the end
+            if sort_by_cost:
+                file_pairs = self._sort_by_cost(file_pairs, infos)
+
         results = []
 
-        # Use ThreadPoolExecutor for parallel compression
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Submit all jobs
-            future_to_file = {}
-            for input_path, output_path in file_pairs:
-                future = executor.submit(
-                    self._compress_single,
+        # Free CPU slices; each running final encode holds one
+        cpu_sets: 'queue.SimpleQueue[FrozenSet[int]]' = queue.SimpleQueue()
+        for cpus in self._cpu_sets():
+            cpu_sets.put(cpus)
+
+        # Two-stage pipeline: a single worker plans each file and runs its
+        # two-pass statistics pass, while the main pool runs the final encodes.
+        # Pass 1 of the next file then overlaps pass 2 of the previous ones.
+        workers = self._effective_workers(preset, codec, preserve_alpha)
+        # Files in flight (first stage, waiting for an encode slot or
+        # encoding). Stage 1 runs at most `workers` files ahead of the
+        # running encodes, enough to keep the pool fed without planning
+        # (and holding pass-1 stats for) the whole batch up front.
+        max_in_flight = 2 * workers
+        pending_pairs = iter(file_pairs)
+
+        with ThreadPoolExecutor(max_workers=1) as pass1_executor, \
+                ThreadPoolExecutor(max_workers=workers) as executor:
+            first_stage: Dict[Future, Tuple[str, str]] = {}
+            final_stage: Set[Future] = set()
+
+            def submit_next() -> None:
+                pair = next(pending_pairs, None)
+                if pair is None:
+                    return
+                input_path, output_path = pair
+                future = pass1_executor.submit(
+                    self._prepare_single,
                     input_path=input_path,
                     output_path=output_path,
                     preset=preset,
                     codec=codec,
                     preserve_alpha=preserve_alpha,
-                    progress_callback=progress_callback,
                     **kwargs
                 )
-                future_to_file[future] = (input_path, output_path)
+                first_stage[future] = pair
 
-            # Collect results as they complete
-            for future in as_completed(future_to_file):
-                input_path, output_path = future_to_file[future]
-                try:
-                    result = future.result()
-                    results.append(result)
-                except Exception as e:
-                    # Create failed result
-                    results.append(CompressionResult(
-                        success=False,
-                        input_path=input_path,
-                        output_path=output_path,
-                        error=str(e)
+            for _ in range(max_in_flight):
+                submit_next()
+
+            while first_stage or final_stage:
+                done, _ = wait(
+                    set(first_stage) | final_stage,
+                    return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    if future in final_stage:
+                        # Collect results as they complete
+                        final_stage.discard(future)
+                        results.append(future.result())
+                        submit_next()
+                        continue
+
+                    # Hand each prepared job to the encode pool once it is ready
+                    input_path, output_path = first_stage.pop(future)
+                    try:
+                        job = future.result()
+                    except Exception as e:
+                        # Create failed result
+                        results.append(CompressionResult(
+                            success=False,
+                            input_path=input_path,
+                            output_path=output_path,
+                            error=str(e)
+                        ))
+                        submit_next()
+                        continue
+
+                    final_stage.add(executor.submit(
+                        self._compress_single, job, progress_callback, cpu_sets
                     ))
 
         return results
@@ -110,6 +213,7 @@ class BatchCompressor:
         codec: Optional[str] = None,
         preserve_alpha: bool = False,
         progress_callback: Optional[ProgressCallback] = None,
+        sort_by_cost: bool = True,
         **kwargs
     ) -> List[CompressionResult]:
         """Async version of compress_batch().
@@ -123,48 +227,145 @@ class BatchCompressor:
         # Build file pairs
         file_pairs = self._build_file_pairs(files, output_dir)
 
-        # Create async tasks
-        tasks = []
-        for input_path, output_path in file_pairs:
-            task = self.compressor.compress_async(
-                input_path=input_path,
-                output_path=output_path,
-                preset=preset,
-                codec=codec,
-                preserve_alpha=preserve_alpha,
-                progress_callback=progress_callback,
-                **kwargs
-            )
-            tasks.append(task)
-
-        # Run all tasks concurrently
+        # With no more files than workers every job starts at once, so only
+        # larger batches need probing and ordering up front
+        if len(file_pairs) > self.max_workers:
+            infos = await self.preflight([input_path for input_path, _ in file_pairs])
+            if sort_by_cost:
+                file_pairs = self._sort_by_cost(file_pairs, infos)
+
+        import asyncio
+
+        # Bound the number of FFmpeg processes running at once. Statistics
+        # passes run one at a time so they overlap the final encodes.
+        workers = self._effective_workers(preset, codec, preserve_alpha)
+        semaphore = asyncio.Semaphore(workers)
+        first_pass_semaphore = asyncio.Semaphore(1)
+        # As in compress_batch(), at most 2 x workers files are in flight
+        # (planned, in pass 1, waiting for an encode slot or encoding), so
+        # pass 1 runs about one pool ahead of the encodes. Waiters are woken
+        # in order, which keeps the cost ordering.
+        in_flight = asyncio.Semaphore(2 * workers)
+        loop = asyncio.get_running_loop()
+        custom_options = dict(kwargs)
+        force_reencode = custom_options.pop('force_reencode', False)
+        custom_options.setdefault('threads', self._threads_per_job(len(file_pairs)))
+
+        # Results are appended as jobs finish, matching compress_batch()
         results = []
-        for coro in asyncio.as_completed(tasks):
+
+        # Free CPU slices; the semaphore guarantees one for each final encode
+        cpu_sets = self._cpu_sets()
+
+        async def compress_bounded(input_path: str, output_path: str) -> None:
+            async with in_flight:
+                await compress_one(input_path, output_path)
+
+        async def compress_one(input_path: str, output_path: str) -> None:
             try:
-                result = await coro
-                results.append(result)
+                job = await loop.run_in_executor(
+                    None,
+                    functools.partial(
+                        self.compressor._plan,
+                        input_path=input_path,
+                        output_path=output_path,
+                        preset=preset,
+                        codec=codec,
+                        preserve_alpha=preserve_alpha,
+                        force_reencode=force_reencode,
+                        custom_options=custom_options
+                    )
+                )
+                try:
+                    async with first_pass_semaphore:
+                        await self.compressor._run_first_pass_async(job)
+                    async with semaphore:
+                        if cpu_sets:
+                            job.cpus = cpu_sets.pop()
+                        try:
+                            result = await self.compressor._run_final_pass_async(
+                                job, progress_callback
+                            )
+                        finally:
+                            if job.cpus:
+                                cpu_sets.append(job.cpus)
+                finally:
+                    job.cleanup()
             except Exception as e:
-                # Create failed result
-                results.append(CompressionResult(
+                # Create failed result; the paths are still in scope here
+                result = CompressionResult(
                     success=False,
-                    input_path="",
-                    output_path="",
+                    input_path=input_path,
+                    output_path=output_path,
                     error=str(e)
-                ))
+                )
+            results.append(result)
+
+        # Run all jobs concurrently; cancelling this coroutine cancels every
+        # job, and each cancelled job kills its FFmpeg process
+        await asyncio.gather(*(
+            compress_bounded(input_path, output_path)
+            for input_path, output_path in file_pairs
+        ))
 
         return results
 
-    def _compress_single(
+    async def preflight(
+        self,
+        input_paths: List[str]
+    ) -> List[Union[VideoInfo, BaseException]]:
+        """Probe input files concurrently and cache their metadata.
+
+        compress() then finds each file's VideoInfo in the cache instead of
+        running FFprobe serially as workers pick files up. Probe errors are
+        returned rather than raised; they are reported when the affected
+        file is compressed.
+
+        Args:
+            input_paths: Input video paths to probe
+
+        Returns:
+            VideoInfo or the raised exception for each path, in input order
+        """
+        return await VideoInfo.from_files_async(
+            input_paths, concurrency=PREFLIGHT_CONCURRENCY
+        )
+
+    def _preflight_sync(
+        self,
+        input_paths: List[str]
+    ) -> List[Union[VideoInfo, BaseException]]:
+        """Synchronous version of preflight().
+
+        Probes from a thread pool, so synchronous callers never load asyncio
+        and it works whether or not an event loop is running.
+
+        Args:
+            input_paths: Input video paths to probe
+
+        Returns:
+            VideoInfo or the raised exception for each path, in input order
+        """
+        with ThreadPoolExecutor(max_workers=PREFLIGHT_CONCURRENCY) as executor:
+            futures = [executor.submit(VideoInfo.from_file, path) for path in input_paths]
+
+        results: List[Union[VideoInfo, BaseException]] = []
+        for future in futures:
+            error = future.exception()
+            results.append(future.result() if error is None else error)
+        return results
+
+    def _prepare_single(
         self,
         input_path: str,
         output_path: str,
         preset: str,
         codec: Optional[str],
         preserve_alpha: bool,
-        progress_callback: Optional[ProgressCallback],
+        force_reencode: bool = False,
         **kwargs
-    ) -> CompressionResult:
-        """Compress a single file (used internally by ThreadPoolExecutor).
+    ) -> _EncodeJob:
+        """Plan a single file and run its statistics pass (first pipeline stage).
 
         Args:
             input_path: Input file path
@@ -172,29 +373,153 @@ class BatchCompressor:
             preset: Preset name
             codec: Optional codec override
             preserve_alpha: Preserve alpha channel
-            progress_callback: Progress callback
+            force_reencode: Transcode even if the input could be remuxed
             **kwargs: Additional options
 
+        Returns:
+            _EncodeJob ready for the final encode
+        """
+        job = self.compressor._plan(
+            input_path, output_path, preset, codec, preserve_alpha, force_reencode, kwargs
+        )
+        try:
+            self.compressor._run_first_pass(job)
+        except Exception:
+            job.cleanup()
+            raise
+
+        return job
+
+    def _compress_single(
+        self,
+        job: _EncodeJob,
+        progress_callback: Optional[ProgressCallback],
+        cpu_sets: Optional['queue.SimpleQueue[FrozenSet[int]]'] = None
+    ) -> CompressionResult:
+        """Run the final encode of a prepared file (second pipeline stage).
+
+        Args:
+            job: Job returned by _prepare_single()
+            progress_callback: Progress callback
+            cpu_sets: Queue of free CPU slices to pin the encode to, if any
+
         Returns:
             CompressionResult
         """
+        # The pool has one thread per slice, so a slice is always free here
+        if cpu_sets is not None and not cpu_sets.empty():
+            job.cpus = cpu_sets.get()
+
         try:
-            return self.compressor.compress(
-                input_path=input_path,
-                output_path=output_path,
-                preset=preset,
-                codec=codec,
-                preserve_alpha=preserve_alpha,
-                progress_callback=progress_callback,
-                **kwargs
-            )
+            return self.compressor._run_final_pass(job, progress_callback)
         except Exception as e:
             return CompressionResult(
                 success=False,
-                input_path=input_path,
-                output_path=output_path,
+                input_path=job.input_path,
+                output_path=job.output_path,
                 error=str(e)
             )
+        finally:
+            if job.cpus and cpu_sets is not None:
+                cpu_sets.put(job.cpus)
+            job.cleanup()
+
+    def _effective_workers(
+        self,
+        preset: str,
+        codec: Optional[str],
+        preserve_alpha: bool
+    ) -> int:
+        """Number of final encodes to run at once for a batch's settings.
+
+        max_workers is sized for libvpx, which scales with CPU cores. When
+        the preset resolves to a hardware encoder the limit is the GPU's
+        encode engine instead, so concurrency is capped at HW_ENCODE_WORKERS.
+
+        Args:
+            preset: Preset name
+            codec: Optional codec override
+            preserve_alpha: Preserve alpha channel
+
+        Returns:
+            Worker count (at least 1)
+        """
+        try:
+            preset_config = self.compressor._resolve_preset(preset, codec)
+        except VideoCompressorError:
+            # Every job fails the same way; let them report it
+            return self.max_workers
+
+        if self.compressor._select_hw_encoder(preset_config, preserve_alpha):
+            return min(self.max_workers, HW_ENCODE_WORKERS)
+        return self.max_workers
+
+    def _cpu_sets(self) -> List[FrozenSet[int]]:
+        """Split the usable CPUs into one slice per worker for pinning.
+
+        CPU numbers are kept contiguous, since neighbouring cores usually
+        share a cache (and a NUMA node).
+
+        Returns:
+            One CPU set per worker, or an empty list when pinning is off,
+            unsupported, or there are fewer CPUs than workers
+        """
+        if not self.pin_cpus or not hasattr(os, 'sched_getaffinity'):
+            return []
+
+        cpus = sorted(os.sched_getaffinity(0))
+        if len(cpus) < self.max_workers:
+            return []
+
+        per_worker = len(cpus) // self.max_workers
+        return [
+            frozenset(cpus[index * per_worker:(index + 1) * per_worker])
+            for index in range(self.max_workers)
+        ]
+
+    def _threads_per_job(self, job_count: int) -> int:
+        """Encoder threads for each job so concurrent encodes fill the CPU.
+
+        Small batches run fewer encodes at once than max_workers, so each
+        one gets a larger share; a single file gets the whole machine.
+
+        Args:
+            job_count: Number of files in the batch
+
+        Returns:
+            Thread count for each libvpx-vp9 encode
+        """
+        concurrent_jobs = max(1, min(self.max_workers, job_count))
+        return max(1, min(VP9_MAX_THREADS, (os.cpu_count() or 1) // concurrent_jobs))
+
+    @staticmethod
+    def _sort_by_cost(
+        file_pairs: List[Tuple[str, str]],
+        infos: List[Union[VideoInfo, BaseException]]
+    ) -> List[Tuple[str, str]]:
+        """Order jobs by estimated encode cost, most expensive first.
+
+        This is longest-processing-time-first scheduling: the pools hand out
+        work in submission order, so the biggest encodes no longer start last
+        and stretch the batch. Cost is duration x pixel count, taken from the
+        preflight results so sorting never runs FFprobe itself.
+
+        Args:
+            file_pairs: List of (input_path, output_path) tuples
+            infos: Preflight result for each pair, in the same order
+
+        Returns:
+            The same pairs sorted by estimated cost, descending
+        """
+        def estimated_cost(info: Union[VideoInfo, BaseException]) -> float:
+            if isinstance(info, BaseException):
+                # Unreadable files fail quickly once their job runs
+                return 0.0
+            return info.duration * info.width * info.height
+
+        costs = [estimated_cost(info) for info in infos]
+        order = sorted(range(len(file_pairs)), key=costs.__getitem__, reverse=True)
+        return [file_pairs[i] for i in order]
 
     def _build_file_pairs(
         self,
@@ -213,31 +538,36 @@ class BatchCompressor:
         Raises:
             ValueError: If output_dir is required but not provided
         """
-        file_pairs = []
+        if output_dir is None and not all(isinstance(item, tuple) for item in files):
+            # Checked once up front so the loop below has no per-item branch on it
+            raise ValueError(
+                "output_dir must be provided when files are input paths only"
+            )
+
+        # Only used for input paths, which means output_dir was given
+        directory = output_dir or ''
+        file_pairs: List[Tuple[str, str]] = []
 
         for item in files:
             if isinstance(item, tuple):
                 # Already a (input, output) pair
                 input_path, output_path = item
-                file_pairs.append((input_path, output_path))
             else:
                 # Just input path, need to construct output path
-                if output_dir is None:
-                    raise ValueError(
-                        "output_dir must be provided when files are input paths only"
-                    )
-
                 input_path = item
-                filename = os.path.basename(input_path)
-                name, _ = os.path.splitext(filename)
-                output_path = os.path.join(output_dir, f"{name}.webm")
-                file_pairs.append((input_path, output_path))
+                name = os.path.splitext(os.path.basename(item))[0]
+                output_path = os.path.join(directory, name + '.webm')
+            file_pairs.append((input_path, output_path))
 
         return file_pairs
 
 
 class BatchProgress:
-    """Aggregate progress tracking for batch operations."""
+    """Aggregate progress tracking for batch operations.
+
+    Callbacks arrive from several worker threads at once, so updates are
+    serialized with a lock and console output is batched.
+    """
 
     def __init__(self, total_files: int):
         """Initialize batch progress tracker.
@@ -248,6 +578,13 @@ class BatchProgress:
         self.total_files = total_files
         self.completed_files = 0
         self.file_progress: Dict[str, float] = {}
+        self._total_progress = 0.0  # Running sum of file_progress values
+        self._lock = threading.Lock()
+
+        # Console output state for create_callback()
+        self._log_lock = threading.Lock()
+        self._pending_log: Dict[str, float] = {}  # Latest unprinted percentage per file
+        self._next_log_time = 0.0
 
     def update_file_progress(self, filename: str, percentage: float) -> None:
         """Update progress for a specific file.
@@ -256,12 +593,14 @@ class BatchProgress:
             filename: Name of file being processed
             percentage: Completion percentage (0-100)
         """
-        old_percentage = self.file_progress.get(filename, 0.0)
-        self.file_progress[filename] = percentage
+        with self._lock:
+            old_percentage = self.file_progress.get(filename, 0.0)
+            self.file_progress[filename] = percentage
+            self._total_progress += percentage - old_percentage
 
-        # If file just completed, increment counter
-        if old_percentage < 100 and percentage >= 100:
-            self.completed_files += 1
+            # If file just completed, increment counter
+            if old_percentage < 100 and percentage >= 100:
+                self.completed_files += 1
 
     @property
     def overall_percentage(self) -> float:
@@ -273,8 +612,7 @@ class BatchProgress:
         if not self.file_progress:
             return 0.0
 
-        total_progress = sum(self.file_progress.values())
-        return total_progress / self.total_files
+        return self._total_progress / self.total_files
 
     def create_callback(self) -> ProgressCallback:
         """Create a progress callback that updates batch progress.
@@ -290,10 +628,25 @@ class BatchProgress:
             eta: Optional[float]
         ) -> None:
             self.update_file_progress(filename, percentage)
-            print(
-                f"[Batch {self.completed_files + 1}/{self.total_files}] "
-                f"{filename}: {percentage:.1f}% "
-                f"(Overall: {self.overall_percentage:.1f}%)"
-            )
+
+            with self._log_lock:
+                self._pending_log[filename] = percentage
+
+                # Coalesce ticks from all workers into one write per
+                # interval; completions are written out immediately
+                now = time.monotonic()
+                if percentage < 100 and now < self._next_log_time:
+                    return
+                self._next_log_time = now + PROGRESS_LOG_INTERVAL
+
+                lines = ''.join(
+                    f"[Batch {self.completed_files + 1}/{self.total_files}] "
+                    f"{name}: {pending:.1f}% "
+                    f"(Overall: {self.overall_percentage:.1f}%)\n"
+                    for name, pending in self._pending_log.items()
+                )
+                self._pending_log.clear()
+                sys.stdout.write(lines)
+                sys.stdout.flush()
 
         return callback
@@ -3,14 +3,19 @@ Compression preset configurations for different use cases.
 """
 
 from dataclasses import dataclass
-from typing import Optional, Tuple, Dict
-from .exceptions import InvalidCodecError
+from types import MappingProxyType
+from typing import Optional, Tuple, Dict, Mapping
+from .exceptions import InvalidCodecError, InvalidPresetError
+from .utils import DATACLASS_SLOTS
 
 
-@dataclass
+@dataclass(frozen=True, **DATACLASS_SLOTS)
 class CompressionPreset:
     """Configuration for video compression presets.
 
+    Presets are immutable so the built-in instances can be shared safely;
+    use ``dataclasses.replace()`` to derive a modified copy.
+
     Attributes:
         name: Human-readable preset name
         codec: Video codec to use ('vp8' or 'vp9')
@@ -22,6 +27,10 @@ class CompressionPreset:
         two_pass: Whether to use two-pass encoding for better quality
         max_resolution: Optional maximum resolution as (width, height) tuple
         audio_codec: Audio codec to use (default: 'libopus' for WebM)
+        hw: Optional hardware VP9 encoder backend ('qsv' or 'vaapi'). Falls back
+            to libvpx-vp9 when FFmpeg doesn't provide it.
+        hw_alternatives: Further backends tried in order after ``hw`` when it
+            is unset or unavailable
     """
 
     name: str
@@ -34,6 +43,8 @@ class CompressionPreset:
     two_pass: bool = False
     max_resolution: Optional[Tuple[int, int]] = None
     audio_codec: str = "libopus"
+    hw: Optional[str] = None
+    hw_alternatives: Tuple[str, ...] = ()
 
     def __post_init__(self) -> None:
         """Validate preset parameters after initialization."""
@@ -53,9 +64,22 @@ class CompressionPreset:
         if self.format not in ('webm',):
             raise ValueError(f"Only 'webm' format is supported, got {self.format}")
 
+        for backend in self.hw_backends:
+            if backend not in ('qsv', 'vaapi'):
+                raise ValueError(f"hw must be 'qsv' or 'vaapi', got {backend}")
+            if self.codec != 'vp9':
+                raise InvalidCodecError("Hardware encoding is only supported with VP9")
+
+    @property
+    def hw_backends(self) -> Tuple[str, ...]:
+        """Hardware backends to try, in order of preference."""
+        if self.hw is None:
+            return self.hw_alternatives
+        return (self.hw,) + self.hw_alternatives
+
 
-# Built-in presets for common use cases
-PRESETS: Dict[str, CompressionPreset] = {
+# Built-in presets for common use cases (read-only; the instances are shared)
+PRESETS: Mapping[str, CompressionPreset] = MappingProxyType({
     'web': CompressionPreset(
         name='Web Optimized',
         codec='vp9',
@@ -127,7 +151,46 @@ PRESETS: Dict[str, CompressionPreset] = {
         two_pass=False,
         max_resolution=(1920, 1080),
     ),
-}
+
+    'web-qsv': CompressionPreset(
+        name='Web Optimized (Intel Quick Sync)',
+        codec='vp9',
+        video_bitrate='1M',
+        audio_bitrate='128k',
+        crf=31,
+        speed=4,
+        format='webm',
+        two_pass=False,
+        max_resolution=(1920, 1080),
+        hw='qsv',
+    ),
+
+    'web-vaapi': CompressionPreset(
+        name='Web Optimized (VAAPI)',
+        codec='vp9',
+        video_bitrate='1M',
+        audio_bitrate='128k',
+        crf=31,
+        speed=4,
+        format='webm',
+        two_pass=False,
+        max_resolution=(1920, 1080),
+        hw='vaapi',
+    ),
+
+    'web-hw': CompressionPreset(
+        name='Web Optimized (any GPU)',
+        codec='vp9',
+        video_bitrate='1M',
+        audio_bitrate='128k',
+        crf=31,
+        speed=4,
+        format='webm',
+        two_pass=False,
+        max_resolution=(1920, 1080),
+        hw_alternatives=('qsv', 'vaapi'),
+    ),
+})
 
 
 def get_preset(name: str) -> CompressionPreset:
@@ -142,15 +205,13 @@ def get_preset(name: str) -> CompressionPreset:
     Raises:
         InvalidPresetError: If preset name doesn't exist
     """
-    from .exceptions import InvalidPresetError
-
-    if name not in PRESETS:
+    try:
+        return PRESETS[name]
+    except KeyError:
         available = ', '.join(PRESETS.keys())
         raise InvalidPresetError(
             f"Unknown preset '{name}'. Available presets: {available}"
-        )
-
-    return PRESETS[name]
+        ) from None
 
 
 def list_presets() -> Dict[str, str]:
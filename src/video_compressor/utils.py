@@ -3,10 +3,17 @@ Utility functions for video compression and validation.
 """
 
 import os
+import re
+import stat
+import sys
 import shutil
 import subprocess
 import json
-from typing import Dict, Optional, Tuple
+import operator
+import functools
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Tuple, Union
 from pathlib import Path
 from .exceptions import (
     FFmpegNotFoundError,
@@ -14,10 +21,22 @@ from .exceptions import (
     InvalidOutputPathError
 )
 
+try:
+    # Optional faster JSON parser for FFprobe output (pip install orjson)
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
 
+# Keyword arguments enabling __slots__ on dataclasses (Python 3.10+)
+DATACLASS_SLOTS: Dict[str, bool] = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@functools.lru_cache(maxsize=None)
 def find_ffmpeg() -> str:
     """Find FFmpeg binary on the system.
 
+    The lookup is cached, so PATH is only searched once per process.
+
     Returns:
         Path to FFmpeg executable
 
@@ -30,9 +49,12 @@ def find_ffmpeg() -> str:
     return ffmpeg_path
 
 
+@functools.lru_cache(maxsize=None)
 def find_ffprobe() -> str:
     """Find FFprobe binary on the system.
 
+    The lookup is cached, so PATH is only searched once per process.
+
     Returns:
         Path to FFprobe executable
 
@@ -45,24 +67,63 @@ def find_ffprobe() -> str:
     return ffprobe_path
 
 
-def validate_input_file(path: str) -> None:
+@functools.lru_cache(maxsize=None)
+def get_available_encoders(ffmpeg_path: str) -> FrozenSet[str]:
+    """List the encoders compiled into an FFmpeg binary.
+
+    The result is cached per binary, so FFmpeg is only queried once.
+
+    Args:
+        ffmpeg_path: Path to FFmpeg executable
+
+    Returns:
+        Set of encoder names (e.g., 'libvpx-vp9', 'vp9_vaapi'); empty if
+        the query fails
+    """
+    try:
+        result = subprocess.run(
+            [ffmpeg_path, '-hide_banner', '-encoders'],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return frozenset()
+
+    # Encoder lines look like: " V....D libvpx-vp9           libvpx VP9 ..."
+    encoders = set()
+    for line in result.stdout.splitlines():
+        fields = line.split()
+        if len(fields) >= 2 and len(fields[0]) == 6 and fields[0][0] in 'VAS':
+            encoders.add(fields[1])
+    return frozenset(encoders)
+
+
+def validate_input_file(path: str) -> os.stat_result:
     """Validate that input file exists and is accessible.
 
     Args:
         path: Path to input file
 
+    Returns:
+        The file's os.stat() result, so callers don't need to stat it again
+
     Raises:
         InvalidInputFileError: If file doesn't exist or is not accessible
     """
-    if not os.path.exists(path):
+    try:
+        file_stat = os.stat(path)
+    except OSError:
         raise InvalidInputFileError(f"Input file not found: {path}")
 
-    if not os.path.isfile(path):
+    if not stat.S_ISREG(file_stat.st_mode):
         raise InvalidInputFileError(f"Input path is not a file: {path}")
 
     if not os.access(path, os.R_OK):
         raise InvalidInputFileError(f"Input file is not readable: {path}")
 
+    return file_stat
+
 
 def validate_output_path(path: str) -> None:
     """Validate that output path can be written to.
@@ -90,6 +151,30 @@ def validate_output_path(path: str) -> None:
         raise InvalidOutputPathError(f"Output directory is not writable: {output_dir}")
 
 
+# Video stream fields read from FFprobe output, with defaults for missing ones
+_STREAM_FIELDS = ('width', 'height', 'codec_name', 'pix_fmt', 'r_frame_rate')
+_STREAM_DEFAULTS = (0, 0, 'unknown', '', '0/1')
+_get_stream_fields = operator.itemgetter(*_STREAM_FIELDS)
+
+# FFmpeg pixel formats that carry an alpha channel: YUV/planar RGB/gray with
+# alpha (yuva*, gbrap*, ya8, ya16*, vuya, ayuv*), packed RGB in any channel
+# order (rgba, bgra, argb, abgr and their 64-bit/float variants) and
+# palettes, whose entries may be transparent (GIF, PNG)
+_ALPHA_PIX_FMT_RE = re.compile(r'^(?:yuva|gbrap|ya\d|vuya|ayuv|pal8)|rgba|bgra|argb|abgr')
+
+
+def pix_fmt_has_alpha(pix_fmt: str) -> bool:
+    """Check whether an FFmpeg pixel format carries an alpha channel.
+
+    Args:
+        pix_fmt: Pixel format name as reported by FFprobe (e.g. 'yuva420p')
+
+    Returns:
+        True if frames in this format can be transparent
+    """
+    return _ALPHA_PIX_FMT_RE.search(pix_fmt) is not None
+
+
 class VideoInfo:
     """Extract and store video file metadata."""
 
@@ -124,57 +209,97 @@ class VideoInfo:
         Raises:
             InvalidInputFileError: If file is not a valid video
         """
-        validate_input_file(path)
-        ffprobe_path = find_ffprobe()
+        file_stat = validate_input_file(path)
+        data = _probe(path, file_stat.st_mtime_ns, file_stat.st_size)
+        return cls._from_probe_data(path, data)
 
-        try:
-            # Run ffprobe to get video metadata
-            cmd = [
-                ffprobe_path,
-                '-v', 'quiet',
-                '-print_format', 'json',
-                '-show_streams',
-                '-show_format',
-                path
-            ]
-
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
-            )
+    @classmethod
+    async def from_file_async(cls, path: str) -> 'VideoInfo':
+        """Async version of from_file().
+
+        FFprobe runs as an asyncio subprocess, so many files can be probed
+        concurrently. Results share the from_file() cache.
+
+        Args:
+            path: Path to video file
+
+        Returns:
+            VideoInfo instance with metadata
+
+        Raises:
+            InvalidInputFileError: If file is not a valid video
+        """
+        file_stat = validate_input_file(path)
+        data = await _probe_async(path, file_stat.st_mtime_ns, file_stat.st_size)
+        return cls._from_probe_data(path, data)
+
+    @classmethod
+    async def from_files_async(
+        cls,
+        paths: List[str],
+        concurrency: int = 16
+    ) -> List[Union['VideoInfo', BaseException]]:
+        """Probe several files concurrently.
+
+        Up to ``concurrency`` FFprobe processes run at once. Results share
+        the from_file() cache.
+
+        Args:
+            paths: Paths to video files
+            concurrency: Maximum number of FFprobe processes running at once
+
+        Returns:
+            One entry per path, in order: a VideoInfo, or the exception raised
+            while probing that file
+        """
+        import asyncio
 
-            data = json.loads(result.stdout)
+        semaphore = asyncio.Semaphore(concurrency)
 
-            # Find video stream
-            video_stream = None
-            for stream in data.get('streams', []):
-                if stream.get('codec_type') == 'video':
-                    video_stream = stream
-                    break
+        async def probe(path: str) -> 'VideoInfo':
+            async with semaphore:
+                return await cls.from_file_async(path)
+
+        return await asyncio.gather(*(probe(path) for path in paths), return_exceptions=True)
+
+    @classmethod
+    def _from_probe_data(cls, path: str, data: Dict) -> 'VideoInfo':
+        """Build a VideoInfo from parsed FFprobe output.
+
+        Raises:
+            InvalidInputFileError: If the output has no usable video stream
+        """
+        try:
+            # The probe selects only the first video stream (v:0)
+            streams = data.get('streams') or []
+            video_stream = streams[0] if streams else None
 
             if not video_stream:
                 raise InvalidInputFileError(f"No video stream found in: {path}")
 
-            # Extract metadata
-            duration = float(data.get('format', {}).get('duration', 0))
-            width = int(video_stream.get('width', 0))
-            height = int(video_stream.get('height', 0))
-            codec = video_stream.get('codec_name', 'unknown')
-            bitrate = int(data.get('format', {}).get('bit_rate', 0))
+            # Extract metadata; all stream fields are normally present, so
+            # fetch them in one call and only fall back to defaults if not
+            try:
+                width, height, codec, pix_fmt, fps_str = _get_stream_fields(video_stream)
+            except KeyError:
+                width, height, codec, pix_fmt, fps_str = (
+                    video_stream.get(name, default)
+                    for name, default in zip(_STREAM_FIELDS, _STREAM_DEFAULTS)
+                )
+            width, height = int(width), int(height)
+
+            format_info = data.get('format', {})
+            duration = float(format_info.get('duration', 0))
+            bitrate = int(format_info.get('bit_rate', 0))
 
             # Check for alpha channel
-            pix_fmt = video_stream.get('pix_fmt', '')
-            has_alpha = 'yuva' in pix_fmt or 'rgba' in pix_fmt or 'gbra' in pix_fmt
+            has_alpha = pix_fmt_has_alpha(pix_fmt)
 
             # Extract FPS
             fps = None
-            fps_str = video_stream.get('r_frame_rate', '0/1')
-            if '/' in fps_str:
-                num, denom = fps_str.split('/')
-                if int(denom) != 0:
-                    fps = int(num) / int(denom)
+            num, sep, denom = fps_str.partition('/')
+            if sep and int(denom) != 0:
+                fps = int(num) / int(denom)
 
             return cls(
                 duration=duration,
@@ -186,15 +311,23 @@ class VideoInfo:
                 fps=fps
             )
 
-        except subprocess.CalledProcessError as e:
-            raise InvalidInputFileError(
-                f"Failed to read video metadata from {path}. Error: {e.stderr}"
-            )
-        except (json.JSONDecodeError, KeyError, ValueError) as e:
+        except (KeyError, ValueError) as e:
             raise InvalidInputFileError(
                 f"Failed to parse video metadata from {path}. Error: {e}"
             )
 
+    @staticmethod
+    def invalidate(path: str) -> None:
+        """Forget cached metadata for a file.
+
+        from_file() already re-probes files whose size or modification time
+        changed; call this when a file is deleted so its entry doesn't linger.
+
+        Args:
+            path: Path to video file
+        """
+        _cache_invalidate(path)
+
     def __repr__(self) -> str:
         return (
             f"VideoInfo(duration={self.duration:.2f}s, "
@@ -203,6 +336,146 @@ class VideoInfo:
         )
 
 
+# FFprobe output cache, most recently used last. Keys are (absolute path,
+# mtime_ns, size) so a file that changes on disk is probed again.
+_probe_cache: 'OrderedDict[Tuple[str, int, int], Dict]' = OrderedDict()
+_probe_cache_lock = threading.Lock()
+PROBE_CACHE_SIZE = 512
+
+
+def _cache_get(key: Tuple[str, int, int]) -> Optional[Dict]:
+    """Look up cached FFprobe output, marking it as recently used."""
+    with _probe_cache_lock:
+        data = _probe_cache.get(key)
+        if data is not None:
+            _probe_cache.move_to_end(key)
+        return data
+
+
+def _cache_put(key: Tuple[str, int, int], data: Dict) -> None:
+    """Store FFprobe output, evicting the least recently used entry if full."""
+    with _probe_cache_lock:
+        _probe_cache[key] = data
+        _probe_cache.move_to_end(key)
+        if len(_probe_cache) > PROBE_CACHE_SIZE:
+            _probe_cache.popitem(last=False)
+
+
+def _cache_invalidate(path: str) -> None:
+    """Drop every cached FFprobe result for a path."""
+    path = os.path.abspath(path)
+    with _probe_cache_lock:
+        for key in [key for key in _probe_cache if key[0] == path]:
+            del _probe_cache[key]
+
+
+def _probe_command(path: str) -> List[str]:
+    """Build the FFprobe command used to read video metadata.
+
+    Only the fields VideoInfo uses are requested, which keeps FFprobe's
+    JSON output (tags, dispositions, side data) from growing to tens of KB.
+    """
+    return [
+        find_ffprobe(),
+        '-v', 'quiet',
+        '-print_format', 'json',
+        '-select_streams', 'v:0',
+        '-show_entries',
+        'stream=width,height,codec_name,pix_fmt,r_frame_rate:format=duration,bit_rate',
+        path
+    ]
+
+
+def _parse_probe_output(path: str, stdout: bytes) -> Dict:
+    """Parse FFprobe JSON output.
+
+    The raw bytes go straight to the JSON parser, so the output is never
+    run through a text decoder first. orjson is used when installed.
+
+    Raises:
+        InvalidInputFileError: If the output isn't valid JSON
+    """
+    try:
+        if orjson is not None:
+            data: Dict = orjson.loads(stdout)
+        else:
+            data = json.loads(stdout)
+        return data
+    except json.JSONDecodeError as e:
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError
+        raise InvalidInputFileError(
+            f"Failed to parse video metadata from {path}. Error: {e}"
+        )
+
+
+def _probe(path: str, mtime_ns: int, size: int) -> Dict:
+    """Run FFprobe on a file and return its parsed JSON output.
+
+    Results are cached; see _probe_cache.
+
+    Args:
+        path: Path to video file
+        mtime_ns: File modification time in nanoseconds
+        size: File size in bytes
+
+    Returns:
+        Parsed FFprobe output
+
+    Raises:
+        InvalidInputFileError: If FFprobe fails or its output can't be parsed
+    """
+    key = (os.path.abspath(path), mtime_ns, size)
+    data = _cache_get(key)
+    if data is not None:
+        return data
+
+    try:
+        result = subprocess.run(
+            _probe_command(path),
+            capture_output=True,
+            check=True
+        )
+    except subprocess.CalledProcessError as e:
+        raise InvalidInputFileError(
+            f"Failed to read video metadata from {path}. "
+            f"Error: {e.stderr.decode('utf-8', 'replace')}"
+        )
+
+    data = _parse_probe_output(path, result.stdout)
+    _cache_put(key, data)
+    return data
+
+
+async def _probe_async(path: str, mtime_ns: int, size: int) -> Dict:
+    """Async version of _probe() using an asyncio subprocess.
+
+    Results share the same cache as _probe().
+    """
+    import asyncio
+
+    key = (os.path.abspath(path), mtime_ns, size)
+    data = _cache_get(key)
+    if data is not None:
+        return data
+
+    process = await asyncio.create_subprocess_exec(
+        *_probe_command(path),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+
+    if process.returncode != 0:
+        raise InvalidInputFileError(
+            f"Failed to read video metadata from {path}. "
+            f"Error: {stderr.decode('utf-8', 'replace')}"
+        )
+
+    data = _parse_probe_output(path, stdout)
+    _cache_put(key, data)
+    return data
+
+
 def get_file_size_mb(path: str) -> float:
     """Get file size in megabytes.
 
@@ -212,9 +485,30 @@ def get_file_size_mb(path: str) -> float:
     Returns:
         File size in MB
     """
-    if not os.path.exists(path):
+    try:
+        return os.stat(path).st_size / (1024 * 1024)
+    except OSError:
         return 0.0
-    return os.path.getsize(path) / (1024 * 1024)
+
+
+def parse_bitrate(value: str) -> int:
+    """Convert an FFmpeg bitrate string to bits per second.
+
+    Args:
+        value: Bitrate such as '1M', '1.5M', '500k' or '128000'
+
+    Returns:
+        Bitrate in bits per second
+
+    Raises:
+        ValueError: If the string isn't a valid bitrate
+    """
+    multipliers = {'k': 1_000, 'm': 1_000_000, 'g': 1_000_000_000}
+    value = value.strip()
+    multiplier = multipliers.get(value[-1:].lower())
+    if multiplier:
+        return int(float(value[:-1]) * multiplier)
+    return int(float(value))
 
 
 def format_time(seconds: float) -> str:
@@ -226,7 +520,6 @@ def format_time(seconds: float) -> str:
     Returns:
         Formatted time string
     """
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
     return f"{hours:02d}:{minutes:02d}:{secs:02d}"
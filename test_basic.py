@@ -93,11 +93,12 @@ def main():
 
     for search_dir in search_dirs:
         if os.path.exists(search_dir):
-            for filename in os.listdir(search_dir):
-                if filename.lower().endswith(('.mp4', '.mov', '.avi')):
-                    test_videos.append(os.path.join(search_dir, filename))
-                    if len(test_videos) >= 3:
-                        break
+            with os.scandir(search_dir) as entries:
+                for entry in entries:
+                    if entry.name.lower().endswith(('.mp4', '.mov', '.avi')) and entry.is_file():
+                        test_videos.append(entry.path)
+                        if len(test_videos) >= 3:
+                            break
         if len(test_videos) >= 3:
             break
 
@@ -18,11 +18,12 @@ def main():
     test_videos = []
 
     if os.path.exists(search_dir):
-        for filename in os.listdir(search_dir):
-            if filename.lower().endswith(('.mp4', '.mov')):
-                test_videos.append(os.path.join(search_dir, filename))
-                if len(test_videos) >= 3:
-                    break
+        with os.scandir(search_dir) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(('.mp4', '.mov')) and entry.is_file():
+                    test_videos.append(entry.path)
+                    if len(test_videos) >= 3:
+                        break
 
     if not test_videos:
         print("No test videos found in ~/Downloads")
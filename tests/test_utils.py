@@ -0,0 +1,50 @@
+"""
+Tests for video metadata helpers.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from video_compressor.utils import VideoInfo, pix_fmt_has_alpha
+
+
+ALPHA_PIX_FMTS = [
+    'yuva420p', 'yuva444p10le', 'rgba', 'bgra', 'argb', 'abgr',
+    'rgba64be', 'bgra64le', 'gbrap', 'gbrap16le', 'ya8', 'ya16be',
+    'ya16le', 'pal8', 'vuya', 'ayuv64le',
+]
+
+OPAQUE_PIX_FMTS = [
+    'yuv420p', 'yuvj420p', 'yuv444p10le', 'nv12', 'rgb24', 'bgr24',
+    'rgb0', 'bgr0', '0rgb', 'gbrp', 'gray', 'gray16be', 'x2rgb10le', '',
+]
+
+
+@pytest.mark.parametrize('pix_fmt', ALPHA_PIX_FMTS)
+def test_alpha_pix_fmts(pix_fmt):
+    assert pix_fmt_has_alpha(pix_fmt)
+
+
+@pytest.mark.parametrize('pix_fmt', OPAQUE_PIX_FMTS)
+def test_opaque_pix_fmts(pix_fmt):
+    assert not pix_fmt_has_alpha(pix_fmt)
+
+
+@pytest.mark.parametrize('pix_fmt', ALPHA_PIX_FMTS)
+def test_probe_data_reports_alpha(pix_fmt):
+    data = {
+        'streams': [{
+            'width': 640,
+            'height': 360,
+            'codec_name': 'qtrle',
+            'pix_fmt': pix_fmt,
+            'r_frame_rate': '30/1',
+        }],
+        'format': {'duration': '1.0', 'bit_rate': '1000'},
+    }
+
+    assert VideoInfo._from_probe_data('input.mov', data).has_alpha
@@ -5,31 +5,274 @@ Flask web interface for Video Compressor SDK.
 
 import os
 import json
-import time
 import uuid
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from flask import Flask, render_template, request, jsonify, send_file, Response
 from werkzeug.utils import secure_filename
 
 # Import SDK (local copy for Vercel deployment)
 from video_compressor import VideoCompressor, VideoInfo, list_presets
+from video_compressor.batch import default_max_workers
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max file size
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'uploads')
 app.config['COMPRESSED_FOLDER'] = os.path.join(os.path.dirname(__file__), 'compressed')
+app.config['CACHE_FOLDER'] = os.path.join(os.path.dirname(__file__), 'compressed_cache')
 
 # Ensure folders exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['COMPRESSED_FOLDER'], exist_ok=True)
+os.makedirs(app.config['CACHE_FOLDER'], exist_ok=True)
 
-# Store compression progress
+# Store compression progress; each file's condition is notified on every update
 compression_progress = {}
+progress_conditions = {}
+progress_conditions_lock = threading.Lock()
 
-ALLOWED_EXTENSIONS = {'mp4', 'mov', 'avi', 'mkv', 'webm'}
+ALLOWED_SUFFIXES = ('.mp4', '.mov', '.avi', '.mkv', '.webm')
+
+# Compressions run here; extra requests wait in the queue instead of starting
+# more FFmpeg processes than the CPU can run
+compression_executor = ThreadPoolExecutor(max_workers=default_max_workers())
+
+# Uploads are probed here so /api/upload can respond before FFprobe finishes
+probe_executor = ThreadPoolExecutor(max_workers=4)
+probe_futures = {}
+
+# (sha256 of upload, preset, preserve_alpha) -> {'path': cached output, 'result': result info}
+# so re-uploads of identical content reuse the earlier output. Each entry owns
+# its own file in the cache folder, least recently used entries are evicted.
+compressed_cache = OrderedDict()
+compressed_cache_lock = threading.Lock()
+COMPRESSED_CACHE_SIZE = 32
+
+# file_id -> sha256 of the upload, computed while it is saved
+upload_hashes = {}
+
+# file_id -> filename in the upload / compressed folder, so requests don't
+# have to scan the folders
+uploads_index = {}
+compressed_index = {}
+
+# Buffer size for copying uploads that can't be sent with os.sendfile()
+UPLOAD_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Probe results are saved next to each upload as <upload><PROBE_SUFFIX>
+PROBE_SUFFIX = '.probe.json'
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return filename.lower().endswith(ALLOWED_SUFFIXES)
+
+
+def get_progress_condition(file_id):
+    """Get the condition notified when a file's progress changes."""
+    with progress_conditions_lock:
+        return progress_conditions.setdefault(file_id, threading.Condition())
+
+
+def set_progress(file_id, state):
+    """Publish a progress update and wake any streams waiting for it."""
+    condition = get_progress_condition(file_id)
+    with condition:
+        compression_progress[file_id] = state
+        condition.notify_all()
+
+
+def find_indexed_file(index, folder, file_id):
+    """Get the name of the file stored for file_id in folder, or None.
+
+    Files written before a restart aren't in the index, so on a miss the
+    folder is scanned for the file_id prefix.
+    """
+    filename = index.get(file_id)
+    if filename is not None:
+        return filename
+
+    for f in os.listdir(folder):
+        if f.startswith(file_id) and not f.endswith(PROBE_SUFFIX):
+            index[file_id] = f
+            return f
+
+    return None
+
+
+def save_upload(file, filepath):
+    """Write an uploaded file to disk and hash it on the way.
+
+    Werkzeug spools large uploads to a temporary file; those are copied
+    in the kernel with os.sendfile() and hashed from the spool, which is
+    still in the page cache. Anything else falls back to a buffered copy
+    with a large buffer.
+
+    Returns:
+        Hex sha256 digest of the upload
+    """
+    stream = file.stream
+    src_fd = None
+    # fileno() on a SpooledTemporaryFile still held in memory would force it
+    # to roll over to disk, so only disk-backed streams take the sendfile path
+    if getattr(stream, '_rolled', True):
+        try:
+            src_fd = stream.fileno()
+            start = stream.tell()
+        except (AttributeError, OSError):
+            src_fd = None
+
+    if src_fd is not None and hasattr(os, 'sendfile'):
+        try:
+            digest = hashlib.sha256()
+            size = os.fstat(src_fd).st_size
+            with open(filepath, 'wb') as dst:
+                offset = start
+                while offset < size:
+                    sent = os.sendfile(dst.fileno(), src_fd, offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+            # Hash separately so sendfile() can still move large ranges at once
+            offset = start
+            while offset < size:
+                chunk = os.pread(src_fd, UPLOAD_BUFFER_SIZE, offset)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                offset += len(chunk)
+            return digest.hexdigest()
+        except OSError:
+            # e.g. platforms where sendfile() only writes to sockets
+            stream.seek(start)
+
+    digest = hashlib.sha256()
+    with open(filepath, 'wb') as dst:
+        for chunk in iter(lambda: stream.read(UPLOAD_BUFFER_SIZE), b''):
+            digest.update(chunk)
+            dst.write(chunk)
+    return digest.hexdigest()
+
+
+def file_sha256(filepath):
+    """Hash a file's contents."""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(UPLOAD_BUFFER_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def remove_file(filepath):
+    """Delete a file if it exists."""
+    try:
+        os.remove(filepath)
+    except FileNotFoundError:
+        pass
+
+
+def link_or_copy(src, dst):
+    """Make dst a hard link to src, or a copy where links aren't possible."""
+    try:
+        if os.path.samefile(src, dst):
+            return
+    except OSError:
+        pass
+
+    remove_file(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def get_cached_output(cache_key):
+    """Get the cache entry for cache_key if its file still exists, or None."""
+    with compressed_cache_lock:
+        cached = compressed_cache.get(cache_key)
+        if cached is None:
+            return None
+        if not os.path.exists(cached['path']):
+            del compressed_cache[cache_key]
+            return None
+        compressed_cache.move_to_end(cache_key)
+        return cached
+
+
+def add_cached_output(cache_key, output_path, result_info):
+    """Keep a link to a finished output so identical uploads can reuse it."""
+    digest, preset, preserve_alpha = cache_key
+    cache_path = os.path.join(
+        app.config['CACHE_FOLDER'],
+        f"{digest}_{secure_filename(preset)}_{int(preserve_alpha)}.webm"
+    )
+    try:
+        link_or_copy(output_path, cache_path)
+    except OSError:
+        return
+
+    with compressed_cache_lock:
+        compressed_cache[cache_key] = {'path': cache_path, 'result': result_info}
+        compressed_cache.move_to_end(cache_key)
+        while len(compressed_cache) > COMPRESSED_CACHE_SIZE:
+            _, evicted = compressed_cache.popitem(last=False)
+            remove_file(evicted['path'])
+
+
+def drop_page_cache(filepath):
+    """Tell the kernel a file's cached pages won't be read again (Linux only)."""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+
+    try:
+        fd = os.open(filepath, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def load_or_probe(filepath):
+    """Get upload metadata, from the sidecar JSON file if it was already probed."""
+    sidecar_path = filepath + PROBE_SUFFIX
+    try:
+        with open(sidecar_path, 'rb') as f:
+            return json.loads(f.read())
+    except (OSError, ValueError):
+        pass
+
+    size_mb = round(os.path.getsize(filepath) / (1024 * 1024), 2)
+    try:
+        video_info = VideoInfo.from_file(filepath)
+        info = {
+            'duration': round(video_info.duration, 2),
+            'width': video_info.width,
+            'height': video_info.height,
+            'codec': video_info.codec,
+            'has_alpha': video_info.has_alpha,
+            'fps': round(video_info.fps, 2) if video_info.fps else None,
+            'size_mb': size_mb
+        }
+    except Exception as e:
+        # Don't persist failures; the next request probes again
+        return {
+            'error': str(e),
+            'size_mb': size_mb
+        }
+
+    try:
+        with open(sidecar_path, 'w') as f:
+            json.dump(info, f)
+    except OSError:
+        pass
+
+    return info
 
 
 @app.route('/')
@@ -83,25 +326,15 @@ def upload_file():
     unique_filename = f"{file_id}_{original_filename}"
 
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-    file.save(filepath)
-
-    # Get video info
-    try:
-        video_info = VideoInfo.from_file(filepath)
-        info = {
-            'duration': round(video_info.duration, 2),
-            'width': video_info.width,
-            'height': video_info.height,
-            'codec': video_info.codec,
-            'has_alpha': video_info.has_alpha,
-            'fps': round(video_info.fps, 2) if video_info.fps else None,
-            'size_mb': round(os.path.getsize(filepath) / (1024 * 1024), 2)
-        }
-    except Exception as e:
-        info = {
-            'error': str(e),
-            'size_mb': round(os.path.getsize(filepath) / (1024 * 1024), 2)
-        }
+    upload_hashes[file_id] = save_upload(file, filepath)
+    uploads_index[file_id] = unique_filename
+
+    # Probe in the background; clients fetch the result from /api/info
+    probe_futures[file_id] = probe_executor.submit(load_or_probe, filepath)
+    info = {
+        'status': 'probing',
+        'size_mb': round(os.path.getsize(filepath) / (1024 * 1024), 2)
+    }
 
     return jsonify({
         'file_id': file_id,
@@ -111,6 +344,28 @@ def upload_file():
     })
 
 
+@app.route('/api/info/<file_id>')
+def get_file_info(file_id):
+    """Get upload metadata, or 202 while it is still being probed."""
+    future = probe_futures.get(file_id)
+    if future is not None:
+        if not future.done():
+            return jsonify({'status': 'probing'}), 202
+        # Later requests read the sidecar, or probe again after a failure
+        probe_futures.pop(file_id, None)
+        try:
+            return jsonify(future.result())
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    # Uploads from before a restart are probed (or read from the sidecar) now
+    upload_filename = find_indexed_file(uploads_index, app.config['UPLOAD_FOLDER'], file_id)
+    if not upload_filename:
+        return jsonify({'error': 'Upload file not found'}), 404
+
+    return jsonify(load_or_probe(os.path.join(app.config['UPLOAD_FOLDER'], upload_filename)))
+
+
 @app.route('/api/compress', methods=['POST'])
 def compress_video():
     """Start video compression."""
@@ -126,10 +381,9 @@ def compress_video():
 
     # Find uploaded file
     upload_path = None
-    for f in os.listdir(app.config['UPLOAD_FOLDER']):
-        if f.startswith(file_id):
-            upload_path = os.path.join(app.config['UPLOAD_FOLDER'], f)
-            break
+    upload_filename = find_indexed_file(uploads_index, app.config['UPLOAD_FOLDER'], file_id)
+    if upload_filename:
+        upload_path = os.path.join(app.config['UPLOAD_FOLDER'], upload_filename)
 
     if not upload_path or not os.path.exists(upload_path):
         return jsonify({'error': 'Upload file not found'}), 404
@@ -140,23 +394,21 @@ def compress_video():
     output_path = os.path.join(app.config['COMPRESSED_FOLDER'], output_filename)
 
     # Initialize progress
-    compression_progress[file_id] = {
+    set_progress(file_id, {
         'status': 'starting',
         'percentage': 0,
         'filename': filename,
         'preset': preset
-    }
-
-    # Start compression in background
-    import threading
+    })
 
+    # Queue compression in background
     def compress_task():
         try:
             compressor = VideoCompressor()
 
             # Progress callback
             def progress_callback(filename, percentage, current_time, total_time, eta):
-                compression_progress[file_id] = {
+                set_progress(file_id, {
                     'status': 'compressing',
                     'percentage': round(percentage, 1),
                     'current_time': round(current_time, 1),
@@ -164,43 +416,65 @@ def compress_video():
                     'eta': round(eta, 1) if eta else None,
                     'filename': filename,
                     'preset': preset
+                })
+
+            # Identical content compressed with the same settings: reuse it.
+            # Uploads from before a restart weren't hashed while saving.
+            digest = upload_hashes.get(file_id)
+            if digest is None:
+                digest = upload_hashes[file_id] = file_sha256(upload_path)
+            cache_key = (digest, preset, bool(preserve_alpha))
+            cached = get_cached_output(cache_key)
+
+            if cached:
+                link_or_copy(cached['path'], output_path)
+                result_info = dict(cached['result'], output_filename=output_filename)
+            else:
+                # The output may be a link to a cache entry from an earlier
+                # run; unlink it so FFmpeg doesn't overwrite the cached file
+                remove_file(output_path)
+
+                # Compress
+                result = compressor.compress(
+                    input_path=upload_path,
+                    output_path=output_path,
+                    preset=preset,
+                    preserve_alpha=preserve_alpha,
+                    progress_callback=progress_callback
+                )
+                result_info = {
+                    'input_size_mb': round(result.input_size_mb, 2),
+                    'output_size_mb': round(result.output_size_mb, 2),
+                    'compression_ratio': round(result.compression_ratio, 2),
+                    'duration': round(result.duration, 2),
+                    'output_filename': output_filename
                 }
+                add_cached_output(cache_key, output_path, result_info)
 
-            # Compress
-            result = compressor.compress(
-                input_path=upload_path,
-                output_path=output_path,
-                preset=preset,
-                preserve_alpha=preserve_alpha,
-                progress_callback=progress_callback
-            )
+            compressed_index[file_id] = output_filename
 
             # Update final status
-            compression_progress[file_id] = {
+            set_progress(file_id, {
                 'status': 'complete',
                 'percentage': 100,
                 'filename': filename,
                 'preset': preset,
-                'result': {
-                    'input_size_mb': round(result.input_size_mb, 2),
-                    'output_size_mb': round(result.output_size_mb, 2),
-                    'compression_ratio': round(result.compression_ratio, 2),
-                    'duration': round(result.duration, 2),
-                    'output_filename': output_filename
-                }
-            }
+                'result': result_info
+            })
 
         except Exception as e:
-            compression_progress[file_id] = {
+            set_progress(file_id, {
                 'status': 'error',
                 'percentage': 0,
                 'error': str(e),
                 'filename': filename
-            }
+            })
+
+        finally:
+            # FFmpeg has read the upload once; free its page cache for others
+            drop_page_cache(upload_path)
 
-    thread = threading.Thread(target=compress_task)
-    thread.daemon = True
-    thread.start()
+    compression_executor.submit(compress_task)
 
     return jsonify({
         'file_id': file_id,
@@ -212,16 +486,30 @@ def compress_video():
 def get_progress(file_id):
     """Get compression progress via Server-Sent Events."""
     def generate():
+        condition = get_progress_condition(file_id)
+        last_data = None
         while True:
-            if file_id in compression_progress:
-                data = compression_progress[file_id]
-                yield f"data: {json.dumps(data)}\n\n"
+            with condition:
+                # Sleep until the compression thread publishes an update
+                if compression_progress.get(file_id) is last_data:
+                    condition.wait(timeout=30)
+                data = compression_progress.get(file_id)
 
-                # Stop if complete or error
-                if data['status'] in ('complete', 'error'):
-                    break
+            if data is None and last_data is not None:
+                # Files were cleaned up while the stream was open
+                break
+
+            if data is None or data is last_data:
+                # No update yet; a comment line keeps the connection alive
+                yield ": keepalive\n\n"
+                continue
+
+            last_data = data
+            yield f"data: {json.dumps(data)}\n\n"
 
-            time.sleep(0.5)
+            # Stop if complete or error
+            if data['status'] in ('complete', 'error'):
+                break
 
     return Response(generate(), mimetype='text/event-stream')
 
@@ -230,14 +518,14 @@ def get_progress(file_id):
 def download_file(file_id):
     """Download compressed video."""
     # Find compressed file
-    for f in os.listdir(app.config['COMPRESSED_FOLDER']):
-        if f.startswith(file_id):
-            filepath = os.path.join(app.config['COMPRESSED_FOLDER'], f)
-            return send_file(
-                filepath,
-                as_attachment=True,
-                download_name=f.split('_', 1)[1]  # Remove UUID prefix
-            )
+    f = find_indexed_file(compressed_index, app.config['COMPRESSED_FOLDER'], file_id)
+    if f:
+        filepath = os.path.join(app.config['COMPRESSED_FOLDER'], f)
+        return send_file(
+            filepath,
+            as_attachment=True,
+            download_name=f.split('_', 1)[1]  # Remove UUID prefix
+        )
 
     return jsonify({'error': 'File not found'}), 404
 
@@ -247,23 +535,38 @@ def cleanup_files(file_id):
     """Clean up uploaded and compressed files."""
     deleted = []
 
-    # Delete uploaded file
-    for f in os.listdir(app.config['UPLOAD_FOLDER']):
-        if f.startswith(file_id):
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], f)
-            os.remove(filepath)
+    # Delete uploaded file and its probe sidecar
+    upload_filename = find_indexed_file(uploads_index, app.config['UPLOAD_FOLDER'], file_id)
+    if upload_filename:
+        upload_path = os.path.join(app.config['UPLOAD_FOLDER'], upload_filename)
+        for f in (upload_filename, upload_filename + PROBE_SUFFIX):
+            try:
+                os.remove(os.path.join(app.config['UPLOAD_FOLDER'], f))
+            except FileNotFoundError:
+                continue
             deleted.append(f)
+        VideoInfo.invalidate(upload_path)
+    uploads_index.pop(file_id, None)
+    upload_hashes.pop(file_id, None)
+    probe_futures.pop(file_id, None)
 
     # Delete compressed file
-    for f in os.listdir(app.config['COMPRESSED_FOLDER']):
-        if f.startswith(file_id):
-            filepath = os.path.join(app.config['COMPRESSED_FOLDER'], f)
-            os.remove(filepath)
+    f = find_indexed_file(compressed_index, app.config['COMPRESSED_FOLDER'], file_id)
+    if f:
+        try:
+            os.remove(os.path.join(app.config['COMPRESSED_FOLDER'], f))
             deleted.append(f)
-
-    # Clear progress
-    if file_id in compression_progress:
-        del compression_progress[file_id]
+        except FileNotFoundError:
+            pass
+    compressed_index.pop(file_id, None)
+
+    # Clear progress and wake any stream still waiting on it
+    condition = get_progress_condition(file_id)
+    with condition:
+        compression_progress.pop(file_id, None)
+        condition.notify_all()
+    with progress_conditions_lock:
+        progress_conditions.pop(file_id, None)
 
     return jsonify({
         'deleted': deleted,
@@ -283,4 +586,12 @@ if __name__ == '__main__':
     print("Press Ctrl+C to stop")
     print("=" * 60)
 
-    app.run(debug=False, host='0.0.0.0', port=port)
+    # Each open progress stream holds a thread, so use a production server
+    # with a large thread pool. It must stay a single process: progress and
+    # file lookups are kept in memory.
+    try:
+        from waitress import serve
+    except ImportError:
+        app.run(debug=False, host='0.0.0.0', port=port, threaded=True)
+    else:
+        serve(app, host='0.0.0.0', port=port, threads=64)
@@ -116,8 +116,9 @@ async function handleFile(file) {
         currentFileId = data.file_id;
         currentFilename = data.filename;
 
-        // Show file info
+        // Show file info; metadata fills in once the server has probed it
         displayFileInfo(data.info, data.filename);
+        loadFileInfo(data.file_id, data.filename);
 
         // Show preset selection
         showSection('preset-section');
@@ -128,6 +129,26 @@ async function handleFile(file) {
     }
 }
 
+// Poll for metadata while the server probes the upload in the background
+async function loadFileInfo(fileId, filename) {
+    try {
+        while (fileId === currentFileId) {
+            const response = await fetch(`/api/info/${fileId}`);
+
+            if (response.status !== 202) {
+                if (response.ok && fileId === currentFileId) {
+                    displayFileInfo(await response.json(), filename);
+                }
+                return;
+            }
+
+            await new Promise(resolve => setTimeout(resolve, 250));
+        }
+    } catch (error) {
+        console.error('Failed to load file info:', error);
+    }
+}
+
 // Display file information
 function displayFileInfo(info, filename) {
     const fileInfo = document.getElementById('file-info');
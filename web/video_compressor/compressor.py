@@ -2,19 +2,29 @@
 Core video compression functionality.
 """
 
+import io
 import os
+import logging
+import shutil
 import subprocess
-import asyncio
-from dataclasses import dataclass
-from typing import Optional, List, Dict
+import tempfile
+import time
+import dataclasses
+import contextlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Optional, Iterator, List, Dict, FrozenSet, Tuple, Union, cast
 from .presets import CompressionPreset, get_preset, PRESETS
-from .progress import ProgressCallback, ProgressTracker, FFmpegProgressParser
+from .progress import ProgressCallback, ProgressTracker, parse_progress_report
 from .utils import (
+    DATACLASS_SLOTS,
     find_ffmpeg,
+    get_available_encoders,
     validate_input_file,
     validate_output_path,
     VideoInfo,
-    get_file_size_mb
+    get_file_size_mb,
+    parse_bitrate
 )
 from .exceptions import (
     CompressionFailedError,
@@ -22,8 +32,46 @@ from .exceptions import (
     InvalidCodecError
 )
 
+logger = logging.getLogger(__name__)
 
-@dataclass
+# Bytes requested per read from the FFmpeg progress pipe
+READ_CHUNK_SIZE = 65536
+
+# Minimum seconds between parses of the FFmpeg progress report
+PROGRESS_PARSE_INTERVAL = 0.25
+
+# Bytes of FFmpeg stderr kept for error reporting
+STDERR_TAIL_SIZE = 8192
+
+# Inputs up to this multiple of the preset bitrate are remuxed, not transcoded
+REMUX_BITRATE_TOLERANCE = 1.2
+
+# DRM render node used for VAAPI hardware encoding
+VAAPI_DEVICE = '/dev/dri/renderD128'
+
+# Most threads given to a single libvpx-vp9 encode
+VP9_MAX_THREADS = 16
+
+# libvpx-vp9 speed for two-pass statistics runs; the first pass only
+# collects statistics, and a fast speed barely changes their quality
+FIRST_PASS_SPEED = 4
+
+
+def vp9_threading(width: int) -> Tuple[int, int]:
+    """Choose libvpx-vp9 tile columns and encoder threads for a frame width.
+
+    Args:
+        width: Output frame width in pixels
+
+    Returns:
+        Tuple of (log2 tile columns, thread count)
+    """
+    # libvpx needs tiles at least 256 pixels wide
+    tile_columns = min(max(1, width // 256).bit_length() - 1, 6)
+    return tile_columns, min(VP9_MAX_THREADS, 2 << tile_columns)
+
+
+@dataclass(frozen=True, **DATACLASS_SLOTS)
 class CompressionResult:
     """Result of a video compression operation.
 
@@ -36,6 +84,7 @@ class CompressionResult:
         compression_ratio: Compression ratio (input_size / output_size)
         duration: Video duration in seconds
         error: Error message if compression failed
+        filename: Input filename (derived from input_path if not given)
     """
     success: bool
     input_path: str
@@ -45,11 +94,44 @@ class CompressionResult:
     compression_ratio: float = 0.0
     duration: float = 0.0
     error: Optional[str] = None
+    filename: str = ''
+
+    def __post_init__(self) -> None:
+        """Fill in the input filename once instead of on every access."""
+        if not self.filename:
+            object.__setattr__(self, 'filename', Path(self.input_path).name)
+
+
+@dataclass
+class _EncodeJob:
+    """A validated compression request with its FFmpeg command(s) built.
+
+    Attributes:
+        input_path: Path to input file
+        output_path: Path to output file
+        filename: Input filename for progress display
+        video_info: Input video metadata
+        input_size: Input file size in MB
+        cmd: Command that writes the output file
+        pass1_cmd: Statistics pass command for two-pass encodes
+        passlog_dir: Temporary directory holding two-pass statistics
+        cpus: CPUs the final encode is pinned to (None for no pinning)
+    """
+    input_path: str
+    output_path: str
+    filename: str
+    video_info: VideoInfo
+    input_size: float
+    cmd: List[str] = field(default_factory=list)
+    pass1_cmd: Optional[List[str]] = None
+    passlog_dir: Optional[str] = None
+    cpus: Optional[FrozenSet[int]] = None
 
-    @property
-    def filename(self) -> str:
-        """Get input filename."""
-        return os.path.basename(self.input_path)
+    def cleanup(self) -> None:
+        """Remove the two-pass statistics directory, if any."""
+        if self.passlog_dir:
+            shutil.rmtree(self.passlog_dir, ignore_errors=True)
+            self.passlog_dir = None
 
 
 class VideoCompressor:
@@ -66,6 +148,8 @@ class VideoCompressor:
         """
         self.ffmpeg_path = ffmpeg_path or find_ffmpeg()
         self.custom_presets: Dict[str, CompressionPreset] = {}
+        # Codec-overridden presets, keyed by (preset name, codec)
+        self._resolved_presets: Dict[Tuple[str, str], CompressionPreset] = {}
 
     def add_preset(self, name: str, preset: CompressionPreset) -> None:
         """Add a custom preset.
@@ -75,6 +159,7 @@ class VideoCompressor:
             preset: CompressionPreset instance
         """
         self.custom_presets[name] = preset
+        self._resolved_presets.clear()
 
     def get_preset(self, name: str) -> CompressionPreset:
         """Get preset by name (checks custom presets first, then built-in).
@@ -100,6 +185,7 @@ class VideoCompressor:
         codec: Optional[str] = None,
         preserve_alpha: bool = False,
         progress_callback: Optional[ProgressCallback] = None,
+        force_reencode: bool = False,
         **custom_options
     ) -> CompressionResult:
         """Compress a video file.
@@ -109,8 +195,10 @@ class VideoCompressor:
             output_path: Path to output WebM file
             preset: Preset name (default: 'web')
             codec: Override codec ('vp8' or 'vp9'). If None, uses preset's codec.
-            preserve_alpha: Preserve alpha channel (VP9 only)
+            preserve_alpha: Preserve alpha channel (VP9 only; ignored if the input has none)
             progress_callback: Optional callback for progress updates
+            force_reencode: Transcode even if the input already matches the
+                preset and could simply be remuxed
             **custom_options: Additional FFmpeg options to override preset
 
         Returns:
@@ -122,105 +210,311 @@ class VideoCompressor:
             CompressionFailedError: If compression fails
             AlphaChannelNotSupportedError: If alpha requested with non-VP9 codec
         """
-        # Validate inputs
-        validate_input_file(input_path)
-        validate_output_path(output_path)
+        job = self._plan(
+            input_path, output_path, preset, codec, preserve_alpha, force_reencode,
+            custom_options
+        )
+        try:
+            self._run_first_pass(job)
+            return self._run_final_pass(job, progress_callback)
+        finally:
+            job.cleanup()
 
-        # Get preset configuration
-        preset_config = self.get_preset(preset)
+    async def compress_async(
+        self,
+        input_path: str,
+        output_path: str,
+        preset: str = 'web',
+        codec: Optional[str] = None,
+        preserve_alpha: bool = False,
+        progress_callback: Optional[ProgressCallback] = None,
+        force_reencode: bool = False,
+        **custom_options
+    ) -> CompressionResult:
+        """Async version of compress().
 
-        # Override codec if specified
-        if codec:
-            if codec not in ('vp8', 'vp9'):
-                raise InvalidCodecError(f"Invalid codec: {codec}")
-            preset_config.codec = codec
+        FFmpeg runs as an asyncio subprocess, so no thread is tied up while
+        the encode is in progress.
 
-        # Validate alpha channel request
-        if preserve_alpha and preset_config.codec != 'vp9':
-            raise AlphaChannelNotSupportedError(preset_config.codec)
+        Args:
+            Same as compress()
 
-        # Get video info
-        video_info = VideoInfo.from_file(input_path)
-        input_size = get_file_size_mb(input_path)
+        Returns:
+            CompressionResult
+        """
+        # Imported here so the synchronous API doesn't pay for loading asyncio
+        import asyncio
 
+        # Validation and probing are short blocking calls; keep them off the loop
+        loop = asyncio.get_running_loop()
+        job = await loop.run_in_executor(
+            None,
+            self._plan,
+            input_path, output_path, preset, codec, preserve_alpha, force_reencode,
+            custom_options
+        )
         try:
-            # Build FFmpeg command
-            cmd = self._build_command(
-                input_path=input_path,
-                output_path=output_path,
-                preset=preset_config,
-                preserve_alpha=preserve_alpha,
-                video_info=video_info,
-                **custom_options
-            )
+            await self._run_first_pass_async(job)
+            return await self._run_final_pass_async(job, progress_callback)
+        finally:
+            job.cleanup()
+
+    def _plan(
+        self,
+        input_path: str,
+        output_path: str,
+        preset: str,
+        codec: Optional[str],
+        preserve_alpha: bool,
+        force_reencode: bool,
+        custom_options: Dict
+    ) -> _EncodeJob:
+        """Validate a compression request and build its FFmpeg command(s).
+
+        The caller must call cleanup() on the returned job once it is done.
+
+        Args:
+            input_path: Path to input video file
+            output_path: Path to output WebM file
+            preset: Preset name
+            codec: Optional codec override
+            preserve_alpha: Preserve alpha channel
+            force_reencode: Transcode even if the input could be remuxed
+            custom_options: Custom options to override preset
+
+        Returns:
+            _EncodeJob ready to run
+        """
+        preset_config, video_info, input_size, preserve_alpha = self._prepare(
+            input_path, output_path, preset, codec, preserve_alpha
+        )
+        job = _EncodeJob(
+            input_path=input_path,
+            output_path=output_path,
+            filename=Path(input_path).name,
+            video_info=video_info,
+            input_size=input_size
+        )
+
+        try:
+            if not force_reencode and self._should_remux(
+                input_path, video_info, preset_config, preserve_alpha, custom_options
+            ):
+                # Input already matches the preset: copy streams, no transcode
+                job.cmd = self._build_remux_command(input_path, output_path)
+            elif self._uses_two_pass(preset_config, preserve_alpha):
+                # Pass 1 only gathers statistics; its output is discarded
+                job.passlog_dir = tempfile.mkdtemp(prefix='video_compressor_')
+                job.pass1_cmd, job.cmd = self._build_command_pass(
+                    input_path=input_path,
+                    output_path=output_path,
+                    preset=preset_config,
+                    preserve_alpha=preserve_alpha,
+                    video_info=video_info,
+                    passlogfile=os.path.join(job.passlog_dir, 'ffmpeg2pass'),
+                    **custom_options
+                )
+            else:
+                # Build FFmpeg command
+                job.cmd = self._build_command(
+                    input_path=input_path,
+                    output_path=output_path,
+                    preset=preset_config,
+                    preserve_alpha=preserve_alpha,
+                    video_info=video_info,
+                    **custom_options
+                )
+        except Exception as e:
+            job.cleanup()
+            raise self._compression_error(output_path, e)
 
+        return job
+
+    def _run_first_pass(self, job: _EncodeJob) -> None:
+        """Run the statistics pass of a two-pass job (no-op otherwise).
+
+        Raises:
+            CompressionFailedError: If FFmpeg fails
+        """
+        if not job.pass1_cmd:
+            return
+
+        try:
+            self._run_ffmpeg_quiet(job.pass1_cmd)
+        except Exception as e:
+            raise self._compression_error(job.output_path, e)
+
+    def _run_final_pass(
+        self,
+        job: _EncodeJob,
+        progress_callback: Optional[ProgressCallback]
+    ) -> CompressionResult:
+        """Run the encode that writes the output file.
+
+        Raises:
+            CompressionFailedError: If FFmpeg fails
+        """
+        try:
             # Run compression with progress tracking
-            self._run_ffmpeg(
-                cmd=cmd,
-                video_info=video_info,
-                filename=os.path.basename(input_path),
-                progress_callback=progress_callback
+            self._run_ffmpeg_sync(
+                cmd=job.cmd,
+                video_info=job.video_info,
+                filename=job.filename,
+                progress_callback=progress_callback,
+                cpus=job.cpus
             )
+            return self._make_result(job)
+        except Exception as e:
+            raise self._compression_error(job.output_path, e)
 
-            # Calculate results
-            output_size = get_file_size_mb(output_path)
-            compression_ratio = input_size / output_size if output_size > 0 else 0
-
-            return CompressionResult(
-                success=True,
-                input_path=input_path,
-                output_path=output_path,
-                input_size_mb=input_size,
-                output_size_mb=output_size,
-                compression_ratio=compression_ratio,
-                duration=video_info.duration
-            )
+    async def _run_first_pass_async(self, job: _EncodeJob) -> None:
+        """Async version of _run_first_pass()."""
+        if not job.pass1_cmd:
+            return
 
+        try:
+            await self._run_ffmpeg_async(
+                cmd=job.pass1_cmd,
+                video_info=job.video_info,
+                filename=job.filename,
+                progress_callback=None
+            )
         except Exception as e:
-            # Clean up partial output file
-            if os.path.exists(output_path):
-                try:
-                    os.remove(output_path)
-                except OSError:
-                    pass
-
-            if isinstance(e, CompressionFailedError):
-                raise
+            raise self._compression_error(job.output_path, e)
 
-            raise CompressionFailedError(f"Compression failed: {str(e)}")
+    async def _run_final_pass_async(
+        self,
+        job: _EncodeJob,
+        progress_callback: Optional[ProgressCallback]
+    ) -> CompressionResult:
+        """Async version of _run_final_pass()."""
+        try:
+            await self._run_ffmpeg_async(
+                cmd=job.cmd,
+                video_info=job.video_info,
+                filename=job.filename,
+                progress_callback=progress_callback,
+                cpus=job.cpus
+            )
+            return self._make_result(job)
+        except Exception as e:
+            raise self._compression_error(job.output_path, e)
 
-    async def compress_async(
+    def _prepare(
         self,
         input_path: str,
         output_path: str,
-        preset: str = 'web',
-        codec: Optional[str] = None,
-        preserve_alpha: bool = False,
-        progress_callback: Optional[ProgressCallback] = None,
-        **custom_options
-    ) -> CompressionResult:
-        """Async version of compress().
+        preset: str,
+        codec: Optional[str],
+        preserve_alpha: bool
+    ) -> Tuple[CompressionPreset, VideoInfo, float, bool]:
+        """Validate a compression request and gather input metadata.
 
         Args:
-            Same as compress()
+            input_path: Path to input video file
+            output_path: Path to output WebM file
+            preset: Preset name
+            codec: Optional codec override
+            preserve_alpha: Preserve alpha channel
 
         Returns:
-            CompressionResult
+            Tuple of (preset configuration, video metadata, input size in MB,
+            whether the alpha channel will actually be preserved)
         """
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(
-            None,
-            lambda: self.compress(
-                input_path=input_path,
-                output_path=output_path,
-                preset=preset,
+        # Validate inputs
+        input_stat = validate_input_file(input_path)
+        validate_output_path(output_path)
+
+        # Get preset configuration
+        preset_config = self._resolve_preset(preset, codec)
+
+        # Validate alpha channel request
+        if preserve_alpha and preset_config.codec != 'vp9':
+            raise AlphaChannelNotSupportedError(preset_config.codec)
+
+        # Get video info
+        video_info = VideoInfo.from_file(input_path)
+        input_size = input_stat.st_size / (1024 * 1024)
+
+        # Encoding an all-opaque alpha plane only costs time, so alpha is
+        # preserved only when the source has one
+        if preserve_alpha and not video_info.has_alpha:
+            logger.warning(
+                "Alpha channel requested but %s has none; encoding without alpha",
+                input_path
+            )
+            preserve_alpha = False
+
+        return preset_config, video_info, input_size, preserve_alpha
+
+    def _resolve_preset(self, preset: str, codec: Optional[str]) -> CompressionPreset:
+        """Look up a preset and apply an optional codec override.
+
+        Overridden presets are derived once and reused, so a batch with a
+        codec override doesn't rebuild and revalidate a copy for every file.
+
+        Args:
+            preset: Preset name
+            codec: Optional codec override
+
+        Returns:
+            CompressionPreset to encode with
+
+        Raises:
+            InvalidPresetError: If preset doesn't exist
+            InvalidCodecError: If codec isn't 'vp8' or 'vp9'
+        """
+        preset_config = self.get_preset(preset)
+        if not codec:
+            return preset_config
+
+        key = (preset, codec)
+        resolved = self._resolved_presets.get(key)
+        if resolved is None:
+            if codec not in ('vp8', 'vp9'):
+                raise InvalidCodecError(f"Invalid codec: {codec}")
+            # Presets are shared, so derive a copy rather than mutating it
+            resolved = dataclasses.replace(
+                preset_config,
                 codec=codec,
-                preserve_alpha=preserve_alpha,
-                progress_callback=progress_callback,
-                **custom_options
+                hw=preset_config.hw if codec == 'vp9' else None,
+                hw_alternatives=preset_config.hw_alternatives if codec == 'vp9' else ()
             )
+            self._resolved_presets[key] = resolved
+
+        return resolved
+
+    @staticmethod
+    def _make_result(job: _EncodeJob) -> CompressionResult:
+        """Build a successful CompressionResult once FFmpeg has finished."""
+        output_size = get_file_size_mb(job.output_path)
+        compression_ratio = job.input_size / output_size if output_size > 0 else 0
+
+        return CompressionResult(
+            success=True,
+            input_path=job.input_path,
+            output_path=job.output_path,
+            input_size_mb=job.input_size,
+            output_size_mb=output_size,
+            compression_ratio=compression_ratio,
+            duration=job.video_info.duration,
+            filename=job.filename
         )
 
+    @staticmethod
+    def _compression_error(output_path: str, error: Exception) -> CompressionFailedError:
+        """Remove partial output after a failure and return the error to raise."""
+        # Clean up partial output file
+        try:
+            Path(output_path).unlink(missing_ok=True)
+        except OSError:
+            pass
+
+        if isinstance(error, CompressionFailedError):
+            return error
+
+        return CompressionFailedError(f"Compression failed: {str(error)}")
+
     def _build_command(
         self,
         input_path: str,
@@ -228,6 +522,8 @@ class VideoCompressor:
         preset: CompressionPreset,
         preserve_alpha: bool,
         video_info: VideoInfo,
+        pass_number: int = 0,
+        passlogfile: Optional[str] = None,
         **custom_options
     ) -> List[str]:
         """Build FFmpeg command from preset and options.
@@ -238,132 +534,540 @@ class VideoCompressor:
             preset: Compression preset
             preserve_alpha: Whether to preserve alpha channel
             video_info: Video metadata
+            pass_number: 1 or 2 for a two-pass encode, 0 for single-pass
+            passlogfile: Prefix for the two-pass statistics file
             **custom_options: Custom options to override preset
 
         Returns:
             List of command arguments
         """
-        cmd = [self.ffmpeg_path, '-i', input_path]
+        # Each option group is built as a tuple (empty when unused) and the
+        # command is assembled in a single list display at the end
+
+        # Hardware VP9 encoder, if the preset asks for one and FFmpeg has it
+        hw_encoder = self._select_hw_encoder(preset, preserve_alpha)
+        device_part = ('-vaapi_device', VAAPI_DEVICE) if hw_encoder == 'vp9_vaapi' else ()
 
         # Video codec
-        if preset.codec == 'vp9':
-            cmd.extend(['-c:v', 'libvpx-vp9'])
+        if hw_encoder:
+            video_codec = hw_encoder
+        elif preset.codec == 'vp9':
+            video_codec = 'libvpx-vp9'
         else:  # vp8
-            cmd.extend(['-c:v', 'libvpx'])
+            video_codec = 'libvpx'
 
         # Alpha channel support (VP9 only)
-        if preserve_alpha:
-            cmd.extend([
-                '-pix_fmt', 'yuva420p',
-                '-auto-alt-ref', '0',
-                '-metadata:s:v:0', 'alpha_mode=1'
-            ])
-
-        # Video bitrate and CRF
-        cmd.extend([
-            '-b:v', custom_options.get('video_bitrate', preset.video_bitrate),
-            '-crf', str(custom_options.get('crf', preset.crf))
-        ])
+        alpha_part = (
+            '-pix_fmt', 'yuva420p',
+            '-auto-alt-ref', '0',
+            '-metadata:s:v:0', 'alpha_mode=1'
+        ) if preserve_alpha else ()
 
-        # Encoding speed
-        if preset.codec == 'vp9':
-            cmd.extend(['-speed', str(custom_options.get('speed', preset.speed))])
-        else:  # VP8
-            cmd.extend(['-cpu-used', str(custom_options.get('speed', preset.speed))])
+        # CRF and encoding speed (libvpx only)
+        quality_part: Tuple[str, ...]
+        if hw_encoder:
+            quality_part = ()
+        else:
+            speed_flag = '-speed' if preset.codec == 'vp9' else '-cpu-used'
+            speed = custom_options.get('speed', preset.speed)
+            if pass_number == 1 and preset.codec == 'vp9':
+                speed = max(speed, FIRST_PASS_SPEED)
+            quality_part = (
+                '-crf', str(custom_options.get('crf', preset.crf)),
+                speed_flag, str(speed)
+            )
 
         # Resolution scaling
+        filters = []
+        output_width = video_info.width
         max_res = custom_options.get('max_resolution', preset.max_resolution)
         if max_res:
             max_width, max_height = max_res
             if video_info.width > max_width or video_info.height > max_height:
-                cmd.extend([
-                    '-vf', f'scale=min({max_width}\\,iw):min({max_height}\\,ih):force_original_aspect_ratio=decrease'
-                ])
+                filters.append(
+                    f'scale=w=min({max_width}\\,iw):h=min({max_height}\\,ih)'
+                    ':force_original_aspect_ratio=decrease:flags=bilinear'
+                )
+                output_width = min(video_info.width, max_width)
+
+        # VAAPI encodes from GPU surfaces, so upload frames after scaling
+        if hw_encoder == 'vp9_vaapi':
+            filters.append('format=nv12,hwupload')
 
-        # Row-based multithreading (VP9)
-        if preset.codec == 'vp9':
-            cmd.extend(['-row-mt', '1'])
+        filter_part = ('-vf', ','.join(filters)) if filters else ()
+
+        # Row-based multithreading and tile parallelism (libvpx-vp9)
+        threading_part: Tuple[str, ...]
+        if preset.codec == 'vp9' and not hw_encoder:
+            tile_columns, threads = vp9_threading(output_width)
+            # With row-mt, threads beyond the tile count still help, so an
+            # explicit thread budget (e.g. from BatchCompressor) wins
+            threads = custom_options.get('threads', threads)
+            if pass_number == 1:
+                # Leave cores to the final encodes a first pass runs beside
+                threads = max(1, threads // 2)
+            threading_part = (
+                '-row-mt', '1',
+                '-tile-columns', str(tile_columns),
+                '-threads', str(threads),
+                '-frame-parallel', '1'
+            )
+        else:
+            threading_part = ()
 
-        # Audio codec
-        if preset.audio_codec:
-            cmd.extend([
+        # Two-pass statistics
+        pass_part = (
+            '-pass', str(pass_number), '-passlogfile', passlogfile
+        ) if pass_number else ()
+
+        if pass_number == 1:
+            # The first pass only analyses video, so skip audio and output
+            output_part = ('-an', '-f', 'null', '-y', os.devnull)
+        else:
+            # Audio codec
+            audio_part = (
                 '-c:a', preset.audio_codec,
                 '-b:a', custom_options.get('audio_bitrate', preset.audio_bitrate)
-            ])
+            ) if preset.audio_codec else ()
+
+            output_part = (
+                *audio_part,
+                # Machine-readable progress report on stdout instead of stderr stats
+                '-progress', 'pipe:1', '-nostats',
+                '-y',  # Overwrite output file
+                # FFmpeg writes the file itself: the WebM muxer seeks back to
+                # write duration and cues, which it can't do on a pipe
+                output_path
+            )
+
+        return [
+            self.ffmpeg_path,
+            *device_part,
+            '-i', input_path,
+            '-c:v', video_codec,
+            *alpha_part,
+            '-b:v', custom_options.get('video_bitrate', preset.video_bitrate),
+            *quality_part,
+            *filter_part,
+            *threading_part,
+            *pass_part,
+            *output_part
+        ]
+
+    def _build_command_pass(
+        self,
+        input_path: str,
+        output_path: str,
+        preset: CompressionPreset,
+        preserve_alpha: bool,
+        video_info: VideoInfo,
+        passlogfile: str,
+        **custom_options
+    ) -> Tuple[List[str], List[str]]:
+        """Build both FFmpeg commands for a two-pass encode.
 
-        # Output options
-        cmd.extend([
+        Args:
+            input_path: Input file path
+            output_path: Output file path
+            preset: Compression preset
+            preserve_alpha: Whether to preserve alpha channel
+            video_info: Video metadata
+            passlogfile: Prefix for the statistics file shared by both passes
+            **custom_options: Custom options to override preset
+
+        Returns:
+            Tuple of (pass 1 command, pass 2 command)
+        """
+        pass1_cmd = self._build_command(
+            input_path=input_path,
+            output_path=output_path,
+            preset=preset,
+            preserve_alpha=preserve_alpha,
+            video_info=video_info,
+            pass_number=1,
+            passlogfile=passlogfile,
+            **custom_options
+        )
+        pass2_cmd = self._build_command(
+            input_path=input_path,
+            output_path=output_path,
+            preset=preset,
+            preserve_alpha=preserve_alpha,
+            video_info=video_info,
+            pass_number=2,
+            passlogfile=passlogfile,
+            **custom_options
+        )
+        return pass1_cmd, pass2_cmd
+
+    def _should_remux(
+        self,
+        input_path: str,
+        video_info: VideoInfo,
+        preset: CompressionPreset,
+        preserve_alpha: bool,
+        custom_options: Dict
+    ) -> bool:
+        """Check whether the input can be copied instead of transcoded.
+
+        True for a WebM input that already uses the preset's codec, fits its
+        resolution limit, and is at most REMUX_BITRATE_TOLERANCE times the
+        preset's total bitrate. Re-encoding such a file costs a full libvpx
+        pass for essentially no size or quality change.
+
+        Args:
+            input_path: Input file path
+            video_info: Video metadata
+            preset: Compression preset
+            preserve_alpha: Whether the alpha channel will be preserved
+            custom_options: Custom options overriding the preset
+
+        Returns:
+            True if the input should be remuxed with stream copy
+        """
+        if Path(input_path).suffix.lower() != '.webm':
+            return False
+
+        if video_info.codec != preset.codec or video_info.has_alpha != preserve_alpha:
+            return False
+
+        max_res = custom_options.get('max_resolution', preset.max_resolution)
+        if max_res and (video_info.width > max_res[0] or video_info.height > max_res[1]):
+            return False
+
+        if not video_info.bitrate:
+            return False
+
+        try:
+            target = parse_bitrate(custom_options.get('video_bitrate', preset.video_bitrate))
+            if preset.audio_codec:
+                target += parse_bitrate(
+                    custom_options.get('audio_bitrate', preset.audio_bitrate)
+                )
+        except ValueError:
+            return False
+
+        return video_info.bitrate <= target * REMUX_BITRATE_TOLERANCE
+
+    def _build_remux_command(self, input_path: str, output_path: str) -> List[str]:
+        """Build an FFmpeg command that copies all streams into a new WebM file.
+
+        Args:
+            input_path: Input file path
+            output_path: Output file path
+
+        Returns:
+            List of command arguments
+        """
+        return [
+            self.ffmpeg_path,
+            '-i', input_path,
+            '-c', 'copy',
+            '-progress', 'pipe:1', '-nostats',
             '-y',  # Overwrite output file
             output_path
-        ])
+        ]
 
-        return cmd
+    def _uses_two_pass(self, preset: CompressionPreset, preserve_alpha: bool) -> bool:
+        """Check whether an encode should run as two passes.
 
-    def _run_ffmpeg(
+        Hardware encoders have no two-pass mode, so presets that select one
+        are encoded in a single pass.
+        """
+        return preset.two_pass and not self._select_hw_encoder(preset, preserve_alpha)
+
+    def _select_hw_encoder(
+        self,
+        preset: CompressionPreset,
+        preserve_alpha: bool
+    ) -> Optional[str]:
+        """Pick the hardware VP9 encoder requested by a preset.
+
+        Backends are tried in the preset's order of preference. Falls back to
+        software encoding (returns None) when the preset names none, alpha
+        must be preserved, or none of them is usable: missing from this
+        FFmpeg build, or (VAAPI) with no render device.
+
+        Args:
+            preset: Compression preset
+            preserve_alpha: Whether to preserve alpha channel
+
+        Returns:
+            FFmpeg encoder name, or None for libvpx
+        """
+        if preset.codec != 'vp9' or preserve_alpha:
+            return None
+
+        for backend in preset.hw_backends:
+            encoder = f'vp9_{backend}'
+            if encoder not in get_available_encoders(self.ffmpeg_path):
+                continue
+            if backend == 'vaapi' and not os.path.exists(VAAPI_DEVICE):
+                continue
+            return encoder
+
+        return None
+
+    def _create_tracker(
         self,
-        cmd: List[str],
         video_info: VideoInfo,
         filename: str,
         progress_callback: Optional[ProgressCallback]
+    ) -> Optional[ProgressTracker]:
+        """Create a progress tracker if a callback was provided."""
+        if not progress_callback:
+            return None
+
+        return ProgressTracker(
+            total_duration=video_info.duration,
+            filename=filename,
+            callback=progress_callback
+        )
+
+    def _run_ffmpeg_sync(
+        self,
+        cmd: List[str],
+        video_info: VideoInfo,
+        filename: str,
+        progress_callback: Optional[ProgressCallback],
+        cpus: Optional[FrozenSet[int]] = None
     ) -> None:
         """Run FFmpeg command with progress tracking.
 
+        Progress is read from the ``-progress pipe:1`` report on stdout;
+        stderr is captured only to report errors.
+
+        Args:
+            cmd: FFmpeg command arguments
+            video_info: Video metadata for progress calculation
+            filename: Input filename for progress display
+            progress_callback: Optional progress callback
+            cpus: Optional CPU set to pin FFmpeg (and its threads) to
+
+        Raises:
+            CompressionFailedError: If FFmpeg fails
+        """
+        output = _FFmpegOutput(self._create_tracker(video_info, filename, progress_callback))
+
+        # stderr goes to a temporary file so a chatty encoder can never block
+        # on a full pipe while we are reading the progress report
+        with tempfile.TemporaryFile() as stderr_file:
+            # The child inherits this thread's affinity, so pin only the
+            # thread and only while it spawns FFmpeg
+            with _thread_pinned_to(cpus):
+                process = subprocess.Popen(
+                    cmd,
+                    stdout=subprocess.PIPE,
+                    stderr=stderr_file,
+                    bufsize=0
+                )
+
+            # Read the report in large chunks into one reusable buffer;
+            # readinto() blocks until data is available and returns 0 once
+            # FFmpeg closes the pipe
+            buffer = memoryview(bytearray(READ_CHUNK_SIZE))
+            # With bufsize=0, stdout is the raw FileIO for the pipe
+            stdout = cast(io.FileIO, process.stdout)
+            try:
+                while True:
+                    count = stdout.readinto(buffer)
+                    if not count:
+                        break
+                    output.feed(buffer[:count])
+            finally:
+                stdout.close()
+
+            return_code = process.wait()
+            output.finish(return_code, _read_tail(stderr_file))
+
+    def _run_ffmpeg_quiet(self, cmd: List[str]) -> None:
+        """Run an FFmpeg command whose output isn't read (two-pass pass 1).
+
+        Nothing is piped back, so where available the process is started with
+        os.posix_spawnp(), skipping Popen's fork/exec bookkeeping.
+
+        Args:
+            cmd: FFmpeg command arguments
+
+        Raises:
+            CompressionFailedError: If FFmpeg fails
+        """
+        with tempfile.TemporaryFile() as stderr_file:
+            if hasattr(os, 'posix_spawnp'):
+                pid = os.posix_spawnp(
+                    cmd[0],
+                    cmd,
+                    os.environ,
+                    file_actions=[
+                        (os.POSIX_SPAWN_OPEN, 1, os.devnull, os.O_WRONLY, 0),
+                        (os.POSIX_SPAWN_DUP2, stderr_file.fileno(), 2)
+                    ]
+                )
+                _, status = os.waitpid(pid, 0)
+                return_code = _exit_code(status)
+            else:
+                return_code = subprocess.call(
+                    cmd,
+                    stdout=subprocess.DEVNULL,
+                    stderr=stderr_file
+                )
+
+            _FFmpegOutput(None).finish(return_code, _read_tail(stderr_file))
+
+    async def _run_ffmpeg_async(
+        self,
+        cmd: List[str],
+        video_info: VideoInfo,
+        filename: str,
+        progress_callback: Optional[ProgressCallback],
+        cpus: Optional[FrozenSet[int]] = None
+    ) -> None:
+        """Run FFmpeg as an asyncio subprocess with progress tracking.
+
         Args:
             cmd: FFmpeg command arguments
             video_info: Video metadata for progress calculation
             filename: Input filename for progress display
             progress_callback: Optional progress callback
+            cpus: Optional CPU set to pin FFmpeg (and its threads) to
 
         Raises:
             CompressionFailedError: If FFmpeg fails
         """
-        # Create progress tracker
-        tracker = None
-        if progress_callback:
-            tracker = ProgressTracker(
-                total_duration=video_info.duration,
-                filename=filename,
-                callback=progress_callback
+        import asyncio
+
+        output = _FFmpegOutput(self._create_tracker(video_info, filename, progress_callback))
+
+        with tempfile.TemporaryFile() as stderr_file:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=stderr_file
             )
+            # The event loop thread is shared by every job, so pin the new
+            # process instead; FFmpeg starts its encoder threads later and
+            # they inherit the mask
+            _pin_process(process.pid, cpus)
 
-        # Run FFmpeg
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True
-        )
+            stdout = cast(asyncio.StreamReader, process.stdout)
+            try:
+                while True:
+                    chunk = await stdout.read(READ_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    output.feed(chunk)
+                return_code = await process.wait()
+            except asyncio.CancelledError:
+                # Don't leave an orphaned encoder running behind a cancelled task
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                raise
 
-        parser = FFmpegProgressParser()
+            output.finish(return_code, _read_tail(stderr_file))
 
-        # Read stderr for progress updates
-        while True:
-            line = process.stderr.readline()
 
-            if not line:
-                if process.poll() is not None:
-                    break
-                continue
+class _FFmpegOutput:
+    """Consume FFmpeg's ``-progress`` report and forward it to a tracker."""
+
+    def __init__(self, tracker: Optional[ProgressTracker]):
+        self.tracker = tracker
+        self._pending = bytearray()  # Report data not yet terminated by '\n'
+        self._next_parse = 0.0  # time.monotonic() before which reports are skipped
+
+    def feed(self, chunk: Union[bytes, memoryview]) -> None:
+        """Consume a chunk of the progress report.
+
+        Args:
+            chunk: Bytes read from the FFmpeg stdout pipe. May be a view of
+                a reused buffer; the data is copied before returning.
+        """
+        if not self.tracker:
+            return
 
-            # Parse progress
-            if tracker:
-                progress = parser.parse_progress(line)
-                if progress:
-                    tracker.update(
-                        current_time=progress['current_time'],
-                        speed=progress['speed']
-                    )
+        self._pending += chunk
+        end = self._pending.rfind(b'\n')
+        if end < 0:
+            return
 
-        # Wait for process to complete
-        return_code = process.wait()
+        # FFmpeg reports several times per second; only the latest values
+        # matter, so complete lines that arrive between parses are dropped
+        now = time.monotonic()
+        if now < self._next_parse:
+            del self._pending[:end + 1]
+            return
+        self._next_parse = now + PROGRESS_PARSE_INTERVAL
 
+        # Parse all complete key=value lines in one pass
+        progress = parse_progress_report(self._pending[:end])
+        del self._pending[:end + 1]
+        if progress:
+            current_time, speed = progress
+            self.tracker.update(current_time=current_time, speed=speed)
+
+    def finish(self, return_code: int, stderr: bytes) -> None:
+        """Report completion once FFmpeg has exited.
+
+        Args:
+            return_code: FFmpeg exit status
+            stderr: Captured FFmpeg error output
+
+        Raises:
+            CompressionFailedError: If FFmpeg exited with an error
+        """
         # Mark as complete
-        if tracker:
-            tracker.complete()
+        if self.tracker:
+            self.tracker.complete()
 
         # Check for errors
         if return_code != 0:
-            stderr = process.stderr.read() if process.stderr else ""
+            error = stderr.decode('utf-8', 'replace').strip()
             raise CompressionFailedError(
-                f"FFmpeg failed with return code {return_code}. Error: {stderr}"
+                f"FFmpeg failed with return code {return_code}. Error: {error}"
             )
+
+
+def _read_tail(file: IO[bytes]) -> bytes:
+    """Read the last STDERR_TAIL_SIZE bytes of a file."""
+    size = file.seek(0, os.SEEK_END)
+    file.seek(max(0, size - STDERR_TAIL_SIZE))
+    return file.read()
+
+
+@contextlib.contextmanager
+def _thread_pinned_to(cpus: Optional[FrozenSet[int]]) -> Iterator[None]:
+    """Temporarily pin the calling thread to a CPU set (Linux only).
+
+    sched_setaffinity(0, ...) applies to the calling thread alone, and
+    processes it spawns inherit the mask, so this pins a child without a
+    preexec_fn (which is unsafe with threads and disables vfork).
+    """
+    if not cpus or not hasattr(os, 'sched_setaffinity'):
+        yield
+        return
+
+    previous = os.sched_getaffinity(0)
+    os.sched_setaffinity(0, cpus)
+    try:
+        yield
+    finally:
+        os.sched_setaffinity(0, previous)
+
+
+def _pin_process(pid: int, cpus: Optional[FrozenSet[int]]) -> None:
+    """Pin an already started process to a CPU set (Linux only)."""
+    if not cpus or not hasattr(os, 'sched_setaffinity'):
+        return
+
+    try:
+        os.sched_setaffinity(pid, cpus)
+    except OSError:
+        # The process may already have exited
+        pass
+
+
+def _exit_code(status: int) -> int:
+    """Convert an os.waitpid() status to a Popen-style return code."""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
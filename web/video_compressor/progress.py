@@ -4,7 +4,7 @@ Progress tracking for video compression operations.
 
 import re
 import time
-from typing import Optional, Callable, Protocol
+from typing import Optional, Callable, Protocol, Tuple, Union
 
 
 class ProgressCallback(Protocol):
@@ -34,8 +34,71 @@ class ProgressCallback(Protocol):
         ...
 
 
+def parse_progress_report(data: Union[bytes, bytearray]) -> Optional[Tuple[float, float]]:
+    """Parse the most recent values from FFmpeg's ``-progress`` output.
+
+    Args:
+        data: Raw ``key=value`` lines written by ``ffmpeg -progress``
+
+    Returns:
+        Tuple of (current_time in seconds, speed multiplier) using the
+        last ``out_time_us`` and ``speed`` values found, or None if the
+        data contains no usable time. Speed is 0.0 while unknown.
+    """
+    # Only the newest values matter, so scan back from the end of the data
+    # instead of splitting every line of the report
+    current_time = _last_report_value(data, b'out_time_us', int)
+    if current_time is None:
+        return None
+
+    speed = _last_report_value(data, b'speed', float)
+
+    return max(current_time, 0) / 1_000_000, speed or 0.0
+
+
+def _last_report_value(
+    data: Union[bytes, bytearray],
+    key: bytes,
+    convert: Callable[[Union[bytes, bytearray]], float]
+) -> Optional[float]:
+    """Return the last parseable value of a key in a ``-progress`` report.
+
+    Args:
+        data: Raw ``key=value`` lines written by ``ffmpeg -progress``
+        key: Key to look up, without the ``=``
+        convert: int or float
+
+    Returns:
+        The converted value, or None if no occurrence parses
+    """
+    needle = b'\n' + key + b'='
+    end = len(data)
+    while True:
+        pos = data.rfind(needle, 0, end)
+        if pos < 0:
+            # The first line has no newline before it
+            if not data.startswith(needle[1:]):
+                return None
+            pos = -1
+        start = pos + len(needle)
+        line_end = data.find(b'\n', start)
+        if line_end < 0:
+            line_end = len(data)
+        try:
+            # Values are reported as N/A until the first frame is encoded
+            return convert(data[start:line_end].strip().rstrip(b'x'))
+        except ValueError:
+            if pos < 0:
+                return None
+            end = pos
+
+
 class FFmpegProgressParser:
-    """Parse FFmpeg progress output from stderr."""
+    """Parse FFmpeg progress output from stderr.
+
+    Kept for backward compatibility. The compressor itself reads FFmpeg's
+    ``-progress`` report with parse_progress_report().
+    """
 
     # Pattern to match FFmpeg progress output
     # Example: frame=  123 fps=30 q=28.0 size=1024kB time=00:00:04.10 bitrate=2048.0kbits/s speed=1.0x
@@ -83,6 +146,10 @@ class FFmpegProgressParser:
             return None
 
 
+# Default minimum time between ProgressTracker callbacks
+UPDATE_INTERVAL_NS = 500_000_000
+
+
 class ProgressTracker:
     """Track compression progress with callback support."""
 
@@ -103,8 +170,17 @@ class ProgressTracker:
         self.filename = filename
         self.callback = callback
         self.start_time = time.time()
-        self.last_update_time = 0.0
-        self.update_interval = 0.5  # Minimum seconds between updates
+        self._last_update_ns = -UPDATE_INTERVAL_NS  # time.monotonic_ns() of the last callback
+        self._update_interval_ns = UPDATE_INTERVAL_NS
+
+    @property
+    def update_interval(self) -> float:
+        """Minimum seconds between progress callbacks."""
+        return self._update_interval_ns / 1e9
+
+    @update_interval.setter
+    def update_interval(self, seconds: float) -> None:
+        self._update_interval_ns = int(seconds * 1e9)
 
     @property
     def elapsed_time(self) -> float:
@@ -118,13 +194,16 @@ class ProgressTracker:
             current_time: Current position in video (seconds)
             speed: Encoding speed multiplier (e.g., 1.5x means 1.5 seconds per second)
         """
-        now = time.time()
+        if not self.callback:
+            return
 
-        # Throttle updates to avoid excessive callbacks
-        if now - self.last_update_time < self.update_interval:
+        # Throttle updates to avoid excessive callbacks. The monotonic clock
+        # is an integer read and isn't affected by wall-clock adjustments.
+        now = time.monotonic_ns()
+        if now - self._last_update_ns < self._update_interval_ns:
             return
 
-        self.last_update_time = now
+        self._last_update_ns = now
 
         # Calculate percentage
         percentage = min((current_time / self.total_duration) * 100, 100.0)
@@ -135,15 +214,13 @@ class ProgressTracker:
             remaining_duration = self.total_duration - current_time
             eta = remaining_duration / speed
 
-        # Call callback if provided
-        if self.callback:
-            self.callback(
-                filename=self.filename,
-                percentage=percentage,
-                current_time=current_time,
-                total_time=self.total_duration,
-                eta=eta
-            )
+        self.callback(
+            filename=self.filename,
+            percentage=percentage,
+            current_time=current_time,
+            total_time=self.total_duration,
+            eta=eta
+        )
 
     def complete(self) -> None:
         """Mark compression as complete (100%)."""